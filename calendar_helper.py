@@ -1,4 +1,6 @@
 # calendar_helper.py
+import math
+from bisect import bisect_left
 from datetime import datetime, date, timedelta
 
 # Calendario Laboral 2025 para Zaragoza (Festivos Nacionales, de Aragón y locales)
@@ -32,27 +34,82 @@ def is_workday(current_date):
     return True
 
 
+# Ordinales (date.toordinal()) de días laborables consecutivos, de menor a mayor. Se amplía bajo demanda
+# y permite avanzar N días laborables con una búsqueda binaria en lugar de recorrer el calendario día a día.
+_WORKDAY_ORDINALS = []
+
+
+def _shift_workdays(workday, count):
+    """
+    Devuelve el día laborable que está `count` días laborables después de `workday`,
+    que debe ser laborable.
+    """
+    ordinal = workday.toordinal()
+    if not _WORKDAY_ORDINALS or ordinal < _WORKDAY_ORDINALS[0]:
+        _WORKDAY_ORDINALS[:] = [ordinal]
+    next_ordinal = _WORKDAY_ORDINALS[-1] + 1
+    while _WORKDAY_ORDINALS[-1] < ordinal:
+        if is_workday(date.fromordinal(next_ordinal)):
+            _WORKDAY_ORDINALS.append(next_ordinal)
+        next_ordinal += 1
+
+    index = bisect_left(_WORKDAY_ORDINALS, ordinal) + count
+    while len(_WORKDAY_ORDINALS) <= index:
+        if is_workday(date.fromordinal(next_ordinal)):
+            _WORKDAY_ORDINALS.append(next_ordinal)
+        next_ordinal += 1
+    return date.fromordinal(_WORKDAY_ORDINALS[index])
+
+
+def _first_work_moment(start_datetime):
+    """
+    Primer instante laborable desde start_datetime: él mismo si cae en día laborable y, si no,
+    el inicio del siguiente día laborable. Si ese día es el inmediatamente posterior se conservan
+    los segundos de start_datetime, como al avanzar minuto a minuto hasta pasar la medianoche.
+    """
+    start_date = start_datetime.date()
+    if is_workday(start_date):
+        return start_datetime
+    next_day = start_date + timedelta(days=1)
+    if is_workday(next_day):
+        return datetime.combine(next_day, datetime.min.time()) + timedelta(
+            seconds=start_datetime.second, microseconds=start_datetime.microsecond)
+    while not is_workday(next_day):
+        next_day += timedelta(days=1)
+    return datetime.combine(next_day, datetime.min.time())
+
+
 def add_work_minutes(start_datetime, minutes_to_add, WORKDAY_MINUTES):
     """
     Calcula la fecha y hora de finalización sumando minutos laborables.
     Salta fines de semana y festivos.
     """
-    current_datetime = start_datetime
+    # Si la tarea empieza en día no laborable, avanza al próximo día de trabajo
+    current_datetime = _first_work_moment(start_datetime)
     remaining_minutes = minutes_to_add
 
-    # Asegurarse de que start_datetime sea un día laborable y una hora de trabajo
-    # Si la tarea empieza fuera de horas o en día no laborable, avanza al próximo día/hora de trabajo
-    while not is_workday(current_datetime.date()) or current_datetime.hour < 0 or current_datetime.hour >= 24: # Asumimos jornada completa por ahora
-         current_datetime += timedelta(minutes=1) # Avanzamos minuto a minuto para encontrar el próximo inicio de jornada
-         if current_datetime.hour == 0 and current_datetime.minute == 0: # Si pasamos a un nuevo día
-             if not is_workday(current_datetime.date()):
-                 current_datetime = datetime.combine(current_datetime.date() + timedelta(days=1), datetime.min.time())
-
+    # Una jornada completa (empezada a medianoche) consume siempre los mismos minutos. Si es un número
+    # entero, restar k jornadas de golpe da exactamente lo mismo que restarlas una a una, así que las
+    # jornadas completas intermedias se saltan con _shift_workdays.
+    full_day_minutes = timedelta(minutes=WORKDAY_MINUTES).total_seconds() / 60
+    can_skip_days = full_day_minutes > 0 and full_day_minutes.is_integer()
 
     while remaining_minutes > 0:
         current_date = current_datetime.date()
 
         if is_workday(current_date):
+            if (can_skip_days and remaining_minutes > full_day_minutes and remaining_minutes < 2 ** 53
+                    and current_datetime.time() == datetime.min.time()):
+                # Jornadas completas que se consumen antes de la jornada en que termina la tarea
+                days = max(1, math.ceil(remaining_minutes / full_day_minutes) - 1)
+                while remaining_minutes - days * full_day_minutes > full_day_minutes:
+                    days += 1
+                while days > 1 and remaining_minutes - (days - 1) * full_day_minutes <= full_day_minutes:
+                    days -= 1
+                remaining_minutes -= days * full_day_minutes
+                current_date = _shift_workdays(current_date, days)
+                current_datetime = datetime.combine(current_date, datetime.min.time())
+
             # Asumimos que la jornada laboral es de 00:00 a 24:00 (WORKDAY_MINUTES es total de minutos laborables al día)
             # Esto simplifica la lógica de jornada continua en el Scheduler.
             # Si tienes horarios de trabajo específicos (ej. 8:00-17:00), necesitaríamos ajustar esto.
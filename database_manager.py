@@ -7,8 +7,65 @@
 # de productos, subfabricaciones y fabricaciones completas.
 # =================================================================================
 
+import functools
+import os
+import re
 import sqlite3
 import logging
+import tempfile
+import threading
+
+# Margen aplicado a los tiempos óptimos para obtener el tiempo real de trabajo (+20 %)
+WORKLOAD_OVERHEAD = 1.20
+
+# Sistemas de ficheros de red (según /proc/mounts) en los que no se puede usar WAL
+_NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "fuse.sshfs"}
+
+
+def _is_local_path(path):
+    """
+    Indica si path está en un disco local. Ante la duda (p. ej. si no se puede consultar
+    el tipo de unidad) se considera local.
+    """
+    if path == ":memory:":
+        return True
+    path = os.path.abspath(path)
+    if os.name == "nt":
+        if path.startswith("\\\\"):  # Ruta UNC (\\servidor\recurso)
+            return False
+        try:
+            import ctypes
+            DRIVE_REMOTE = 4
+            return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") != DRIVE_REMOTE
+        except (AttributeError, OSError):
+            return True
+    try:
+        with open("/proc/mounts") as mounts:
+            # El kernel escapa en octal los espacios, tabuladores, saltos de línea y '\\' de los puntos de montaje
+            entries = [(re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), fields[1]), fields[2])
+                       for fields in (line.split() for line in mounts) if len(fields) >= 3]
+    except OSError:
+        return True
+    path = os.path.realpath(path)
+    # El punto de montaje más largo que contiene la ruta es el de su sistema de ficheros
+    fs_type = max(((mount, fs) for mount, fs in entries
+                   if path == mount or path.startswith(mount.rstrip("/") + "/")),
+                  key=lambda entry: len(entry[0]), default=(None, None))[1]
+    return fs_type not in _NETWORK_FILESYSTEMS
+
+
+def _escape_like(text):
+    """Escapa '\\', '%' y '_' para buscar text literalmente con LIKE ... ESCAPE '\\'."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _sincronizado(metodo):
+    """Serializa el acceso al cursor compartido cuando se usa desde hilos de trabajo."""
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self.lock:
+            return metodo(self, *args, **kwargs)
+    return envoltura
 
 
 class DatabaseManager:
@@ -16,20 +73,78 @@ class DatabaseManager:
     Gestiona todas las operaciones de la base de datos SQLite para la aplicación.
     """
 
+    SEARCH_LIMIT = 200  # Máximo de filas devueltas por las búsquedas de la interfaz
+    DETAILS_CACHE_SIZE = 128  # Fichas de producto/fabricación recordadas entre escrituras
+
+    # Ajustes de la conexión: WAL deja leer mientras otro hilo escribe y, con synchronous=NORMAL,
+    # las confirmaciones no esperan a un fsync cada una. WAL exige que todos los que abren la BD estén
+    # en el mismo equipo (usa memoria compartida): en una unidad de red SQLite lo activa sin dar error,
+    # pero la BD se corrompe en cuanto otro equipo la abre. Por eso sólo se usa en discos locales.
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-20000",
+    )
+    # BD en una unidad de red: diario de rollback clásico (el modo WAL queda guardado en el fichero,
+    # así que hay que desactivarlo explícitamente) y synchronous por defecto (FULL)
+    NETWORK_PRAGMAS = (
+        "PRAGMA journal_mode=DELETE",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-20000",
+    )
+
+    # Consultas de las búsquedas de la interfaz. Al ser siempre el mismo texto, la caché de sentencias
+    # de sqlite3 reutiliza la consulta ya preparada en cada pulsación.
+    SQL_SEARCH_PRODUCTS_FTS = (
+        "SELECT codigo, descripcion, codigo || ? || descripcion FROM productos_fts "
+        "WHERE productos_fts MATCH ? LIMIT ?")
+    SQL_SEARCH_PRODUCTS = (
+        "SELECT codigo, descripcion, codigo || ? || descripcion FROM productos "
+        "WHERE codigo LIKE ? ESCAPE '\\' OR descripcion LIKE ? ESCAPE '\\' LIMIT ?")
+    SQL_SEARCH_FABRICACIONES = (
+        "SELECT codigo, descripcion, codigo || ? || descripcion FROM fabricaciones "
+        "WHERE codigo LIKE ? ESCAPE '\\' OR descripcion LIKE ? ESCAPE '\\' LIMIT ?")
+    SQL_SEARCH_FABRICACIONES_PREFIX = (
+        "SELECT codigo, descripcion, codigo || ? || descripcion FROM fabricaciones "
+        "WHERE codigo LIKE ? ESCAPE '\\' OR descripcion LIKE ? ESCAPE '\\' LIMIT ?")
+
     def __init__(self, db_path="montaje.db"):
         """
         Inicializa el gestor y se conecta a la base de datos.
         Crea las tablas si no existen.
         """
+        # La interfaz consulta la BD desde hilos de trabajo; el cerrojo protege la conexión y el cursor
+        self.lock = threading.RLock()
+        self.db_path = db_path
+        self.fts_enabled = False  # Índice de trigramas para la búsqueda de productos (ver _create_search_index)
+        # (tabla, código) -> resultado de get_*_details; se vacía en cada escritura, propia o de otra conexión
+        self._details_cache = {}
+        self._details_cache_token = None  # change_token() con el que se llenó la caché
         try:
-            self.conn = sqlite3.connect(db_path)
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
             self.cursor = self.conn.cursor()
+            self._configure_connection()
             self.create_tables()
             logging.info(f"Conexión exitosa a la base de datos en: {db_path}")
         except sqlite3.Error as e:
             logging.critical(f"CRITICAL: Error al conectar con la base de datos: {e}")
             self.conn = None
 
+    def _configure_connection(self):
+        """
+        Aplica PRAGMAS, o NETWORK_PRAGMAS si la BD no está en un disco local. Si SQLite rechaza
+        alguno (p. ej. otra conexión tiene la BD abierta) se registra y se sigue con el valor actual.
+        """
+        pragmas = self.PRAGMAS if _is_local_path(self.db_path) else self.NETWORK_PRAGMAS
+        if pragmas is self.NETWORK_PRAGMAS:
+            logging.info(f"La BD '{self.db_path}' está en una unidad de red: no se usa el modo WAL.")
+        for pragma in pragmas:
+            try:
+                self.conn.execute(pragma)
+            except sqlite3.Error as e:
+                logging.warning(f"No se pudo aplicar '{pragma}': {e}")
+
     def create_tables(self):
         """Crea las tablas necesarias en la base de datos si no existen previamente."""
         if not self.conn:
@@ -72,20 +187,177 @@ class DatabaseManager:
                     FOREIGN KEY (producto_codigo) REFERENCES productos (codigo) ON DELETE CASCADE
                 )
             """)
+            # Índices de las claves por las que get_data_for_calculation y get_*_details unen las tablas
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_subfabricaciones_producto ON subfabricaciones (producto_codigo)")
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_fabricacion_contenido_fab ON fabricacion_contenido (fabricacion_codigo)")
+            # LIKE no distingue mayúsculas: sólo índices NOCASE permiten resolver 'texto%' por rango
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_fabricaciones_codigo_nocase ON fabricaciones (codigo COLLATE NOCASE)")
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_fabricaciones_desc_nocase ON fabricaciones (descripcion COLLATE NOCASE)")
             self.conn.commit()
             logging.info("Tablas de la base de datos verificadas/creadas con éxito.")
         except sqlite3.Error as e:
             logging.error(f"Error al crear las tablas de la BD: {e}")
+        self._create_search_index()
 
+    def _create_search_index(self):
+        """
+        Crea un índice FTS5 de trigramas sobre productos(codigo, descripcion) para que la
+        búsqueda por subcadena no recorra la tabla completa. Los triggers lo mantienen
+        sincronizado. Si SQLite no soporta FTS5/trigram se sigue usando LIKE.
+        """
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_fts'")
+            exists = self.cursor.fetchone() is not None
+            self.cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts
+                USING fts5(codigo, descripcion, content='productos', tokenize='trigram')
+            """)
+            self.cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+                    INSERT INTO productos_fts(rowid, codigo, descripcion) VALUES (new.rowid, new.codigo, new.descripcion);
+                END
+            """)
+            self.cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+                    INSERT INTO productos_fts(productos_fts, rowid, codigo, descripcion)
+                    VALUES ('delete', old.rowid, old.codigo, old.descripcion);
+                END
+            """)
+            self.cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE ON productos BEGIN
+                    INSERT INTO productos_fts(productos_fts, rowid, codigo, descripcion)
+                    VALUES ('delete', old.rowid, old.codigo, old.descripcion);
+                    INSERT INTO productos_fts(rowid, codigo, descripcion) VALUES (new.rowid, new.codigo, new.descripcion);
+                END
+            """)
+            if not exists:
+                # Índice nuevo sobre una BD con datos: se indexan los productos existentes
+                self.cursor.execute("INSERT INTO productos_fts(productos_fts) VALUES ('rebuild')")
+            self.conn.commit()
+            self.fts_enabled = True
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logging.warning(f"Índice de búsqueda FTS5 no disponible, se usará LIKE: {e}")
+
+    @_sincronizado
+    def change_token(self):
+        """
+        Valor que cambia con cada escritura confirmada en la BD: total_changes cuenta las de esta
+        conexión y PRAGMA data_version las de otras (otro proceso u otro equipo con la misma BD).
+        Sirve para invalidar cachés de lecturas.
+        """
+        if not self.conn: return None
+        try:
+            return self.conn.total_changes, self.conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error as e:
+            logging.warning(f"No se pudo consultar PRAGMA data_version: {e}")
+            return object()  # Distinto de cualquier valor anterior: las cachés se vacían
+
+    def _cached_details(self, key):
+        """Ficha cacheada para key, o None; antes se descarta la caché si la BD ha cambiado."""
+        token = self.change_token()
+        if token != self._details_cache_token:
+            self._details_cache.clear(); self._details_cache_token = token
+        return self._details_cache.get(key)
+
+    def _cache_details(self, key, result):
+        if len(self._details_cache) >= self.DETAILS_CACHE_SIZE:
+            del self._details_cache[next(iter(self._details_cache))]  # El más antiguo
+        self._details_cache[key] = result
+        return result
+
+    @_sincronizado
+    def clear_details_cache(self):
+        """Olvida las fichas cacheadas por get_product_details/get_fabricacion_details."""
+        self._details_cache.clear()
+
+    def _is_live_db(self, path):
+        """Indica si path es el propio fichero de la BD abierta."""
+        return (self.db_path != ":memory:" and os.path.exists(path) and os.path.exists(self.db_path)
+                and os.path.samefile(path, self.db_path))
+
+    @_sincronizado
+    def backup_to(self, dest_path):
+        """
+        Guarda una copia consistente de la BD (incluidos los cambios aún en el WAL) con la API de backup.
+        La copia se escribe en un temporal junto a dest_path y sólo lo reemplaza si termina bien, así que
+        una copia anterior en dest_path no se pierde si falla.
+        """
+        if not self.conn: return False
+        if self._is_live_db(dest_path):
+            logging.error(f"No se puede guardar la copia de seguridad sobre la propia BD abierta ('{dest_path}').")
+            return False
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(dest_path)))
+            os.close(fd)
+            dest = sqlite3.connect(tmp_path)
+            try:
+                self.conn.backup(dest)
+                # La copia es un único fichero autocontenido, sin -wal al lado
+                dest.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                dest.close()
+            os.replace(tmp_path, dest_path)
+            tmp_path = None
+            logging.info(f"Copia de seguridad de la BD guardada en '{dest_path}'.")
+            return True
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Error al guardar la copia de seguridad en '{dest_path}': {e}")
+            return False
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @_sincronizado
+    def restore_from(self, source_path):
+        """
+        Sustituye el contenido de la BD por el de source_path, que debe ser una BD SQLite válida.
+        Una BD en modo WAL no puede cambiar de tamaño de página, así que la restauración se hace con
+        el diario de rollback y después se vuelven a aplicar los PRAGMAS de la conexión.
+        """
+        if not self.conn: return False
+        if self._is_live_db(source_path):
+            logging.error(f"'{source_path}' es la propia BD abierta: no hay nada que restaurar.")
+            return False
+        # sqlite3.connect crearía una BD vacía que, restaurada, borraría todos los datos
+        if not os.path.isfile(source_path) or os.path.getsize(source_path) == 0:
+            logging.error(f"'{source_path}' no existe o está vacío: no se restaura la BD.")
+            return False
+        try:
+            source = sqlite3.connect(source_path)
+            try:
+                # Se comprueba antes de tocar la BD actual que el fichero es una BD válida
+                source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+                self.conn.execute("PRAGMA journal_mode=DELETE")
+                source.backup(self.conn)
+            finally:
+                source.close()
+            self._details_cache.clear()
+            logging.info(f"BD restaurada desde '{source_path}'.")
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error al restaurar la BD desde '{source_path}': {e}")
+            return False
+        finally:
+            self._configure_connection()
+
+    @_sincronizado
     def close(self):
         """Cierra la conexión con la base de datos."""
         if self.conn:
             self.conn.close()
             logging.info("Conexión a la base de datos cerrada.")
 
+    @_sincronizado
     def add_product(self, data, subfabricaciones=None):
         """Añade un nuevo producto y sus subfabricaciones si las tiene."""
         if not self.conn: return False
+        self._details_cache.clear()
         try:
             self.cursor.execute("BEGIN TRANSACTION")
             product_sql = """
@@ -116,20 +388,39 @@ class DatabaseManager:
             logging.error(f"Error de BD al añadir el producto '{data['codigo']}': {e}")
             return False
 
-    def search_products(self, query):
-        """Busca productos por código o descripción."""
+    @_sincronizado
+    def search_products(self, query, separador=" - "):
+        """Busca productos cuyo código o descripción contienen query como subcadena literal.
+
+        Devuelve tuplas (codigo, descripcion, texto), con el texto a mostrar ya concatenado por SQLite.
+        Diferencias con el antiguo LIKE '%query%':
+        - '%' y '_' se buscan tal cual, no como comodines.
+        - Con el índice FTS5 (consultas de 3 o más caracteres) las mayúsculas no se distinguen tampoco
+          fuera de ASCII ('ÉMBOLO' encuentra 'émbolo'); las tildes sí cuentan ('embolo' no lo encuentra).
+        - Las consultas de 1 o 2 caracteres, que el índice de trigramas no cubre, van por LIKE: sólo
+          ignoran mayúsculas en ASCII.
+        """
         if not self.conn: return []
         try:
-            sql = "SELECT codigo, descripcion FROM productos WHERE codigo LIKE ? OR descripcion LIKE ?"
-            self.cursor.execute(sql, (f"%{query}%", f"%{query}%"))
+            # El tokenizador trigram sólo indexa subcadenas de 3 o más caracteres
+            if self.fts_enabled and len(query) >= 3:
+                self.cursor.execute(self.SQL_SEARCH_PRODUCTS_FTS,
+                                    (separador, '"' + query.replace('"', '""') + '"', self.SEARCH_LIMIT))
+            else:
+                # Se escapan los comodines para que LIKE busque lo mismo que el índice FTS5
+                patron = "%" + _escape_like(query) + "%"
+                self.cursor.execute(self.SQL_SEARCH_PRODUCTS, (separador, patron, patron, self.SEARCH_LIMIT))
             return self.cursor.fetchall()
         except sqlite3.Error as e:
             logging.error(f"Error de BD al buscar productos con query '{query}': {e}")
             return []
 
+    @_sincronizado
     def get_product_details(self, codigo):
         """Obtiene todos los detalles de un producto por su código."""
         if not self.conn: return None, []
+        cached = self._cached_details(("productos", codigo))
+        if cached is not None: return cached
         try:
             self.cursor.execute("SELECT * FROM productos WHERE codigo = ?", (codigo,))
             producto_data = self.cursor.fetchone()
@@ -137,14 +428,16 @@ class DatabaseManager:
 
             self.cursor.execute("SELECT * FROM subfabricaciones WHERE producto_codigo = ?", (codigo,))
             subfabricaciones_data = self.cursor.fetchall()
-            return producto_data, subfabricaciones_data
+            return self._cache_details(("productos", codigo), (producto_data, subfabricaciones_data))
         except sqlite3.Error as e:
             logging.error(f"Error de BD al obtener detalles del producto '{codigo}': {e}")
             return None, []
 
+    @_sincronizado
     def update_product(self, codigo_original, data, subfabricaciones=None):
         """Actualiza un producto existente y sus subfabricaciones."""
         if not self.conn: return False
+        self._details_cache.clear()
         try:
             self.cursor.execute("BEGIN TRANSACTION")
             sql_update = """
@@ -183,9 +476,11 @@ class DatabaseManager:
             logging.error(f"Error de BD al actualizar el producto '{codigo_original}': {e}")
             return False
 
+    @_sincronizado
     def delete_product(self, codigo):
         """Elimina un producto de la base de datos."""
         if not self.conn: return False
+        self._details_cache.clear()
         try:
             self.cursor.execute("DELETE FROM productos WHERE codigo = ?", (codigo,))
             self.conn.commit()
@@ -195,9 +490,11 @@ class DatabaseManager:
             logging.error(f"Error de BD al eliminar el producto '{codigo}': {e}")
             return False
 
+    @_sincronizado
     def add_fabricacion(self, codigo, descripcion, contenido):
         """Añade una nueva fabricación y su contenido a la base de datos."""
         if not self.conn: return False
+        self._details_cache.clear()
         try:
             self.cursor.execute("BEGIN TRANSACTION")
             self.cursor.execute("INSERT INTO fabricaciones (codigo, descripcion) VALUES (?, ?)", (codigo, descripcion))
@@ -212,20 +509,33 @@ class DatabaseManager:
             logging.error(f"Error de BD al añadir la fabricación '{codigo}': {e}")
             return False
 
-    def search_fabricaciones(self, query):
-        """Busca fabricaciones por código o descripción."""
+    @_sincronizado
+    def search_fabricaciones(self, query, separador=" - ", prefijo=False, limite=None):
+        """Busca fabricaciones por código o descripción. Devuelve tuplas (codigo, descripcion, texto).
+
+        Con prefijo=True sólo se buscan los que empiezan por query, lo que resuelven los índices NOCASE
+        sin recorrer la tabla. Como en search_products, '%' y '_' se buscan tal cual.
+        """
         if not self.conn: return []
         try:
-            sql = "SELECT codigo, descripcion FROM fabricaciones WHERE codigo LIKE ? OR descripcion LIKE ?"
-            self.cursor.execute(sql, (f"%{query}%", f"%{query}%"))
+            if prefijo:
+                patron = _escape_like(query) + "%"
+                sql = self.SQL_SEARCH_FABRICACIONES_PREFIX
+            else:
+                patron = "%" + _escape_like(query) + "%"
+                sql = self.SQL_SEARCH_FABRICACIONES
+            self.cursor.execute(sql, (separador, patron, patron, limite or self.SEARCH_LIMIT))
             return self.cursor.fetchall()
         except sqlite3.Error as e:
             logging.error(f"Error de BD al buscar fabricaciones con query '{query}': {e}")
             return []
 
+    @_sincronizado
     def get_fabricacion_details(self, codigo):
         """Obtiene los detalles y el contenido de una fabricación."""
         if not self.conn: return None, []
+        cached = self._cached_details(("fabricaciones", codigo))
+        if cached is not None: return cached
         try:
             self.cursor.execute("SELECT * FROM fabricaciones WHERE codigo = ?", (codigo,))
             fab_data = self.cursor.fetchone()
@@ -239,14 +549,16 @@ class DatabaseManager:
                   """
             self.cursor.execute(sql, (codigo,))
             contenido_data = self.cursor.fetchall()
-            return fab_data, contenido_data
+            return self._cache_details(("fabricaciones", codigo), (fab_data, contenido_data))
         except sqlite3.Error as e:
             logging.error(f"Error de BD al obtener detalles de la fabricación '{codigo}': {e}")
             return None, []
 
+    @_sincronizado
     def update_fabricacion(self, codigo_original, data, contenido):
         """Actualiza una fabricación existente y su contenido."""
         if not self.conn: return False
+        self._details_cache.clear()
         try:
             self.cursor.execute("BEGIN TRANSACTION")
             sql_update = "UPDATE fabricaciones SET codigo = ?, descripcion = ? WHERE codigo = ?"
@@ -263,9 +575,11 @@ class DatabaseManager:
             logging.error(f"Error de BD al actualizar la fabricación '{codigo_original}': {e}")
             return False
 
+    @_sincronizado
     def delete_fabricacion(self, codigo):
         """Elimina una fabricación de la base de datos."""
         if not self.conn: return False
+        self._details_cache.clear()
         try:
             self.cursor.execute("DELETE FROM fabricaciones WHERE codigo = ?", (codigo,))
             self.conn.commit()
@@ -275,35 +589,42 @@ class DatabaseManager:
             logging.error(f"Error de BD al eliminar la fabricación '{codigo}': {e}")
             return False
 
+    @_sincronizado
     def get_data_for_calculation(self, fabricacion_codigo):
         """Recopila todos los datos necesarios para el cálculo de tiempos de una fabricación."""
         if not self.conn: return []
         try:
-            self.cursor.execute(
-                "SELECT producto_codigo, cantidad FROM fabricacion_contenido WHERE fabricacion_codigo = ?",
-                (fabricacion_codigo,))
-            contenido = self.cursor.fetchall()
+            # Una sola consulta: cada línea del contenido con su producto y, si las tiene, sus subfabricaciones
+            # (una fila por subfabricación). Las líneas cuyo producto ya no existe quedan fuera del JOIN.
+            sql = """
+                  SELECT fc.id, p.codigo, p.descripcion, p.departamento, p.tipo_trabajador, p.donde,
+                         p.tiene_subfabricaciones, p.tiempo_optimo, fc.cantidad,
+                         s.descripcion, s.tiempo, s.tipo_trabajador
+                  FROM fabricacion_contenido fc
+                           JOIN productos p ON p.codigo = fc.producto_codigo
+                           LEFT JOIN subfabricaciones s
+                                     ON s.producto_codigo = p.codigo AND p.tiene_subfabricaciones = 1
+                  WHERE fc.fabricacion_codigo = ?
+                  ORDER BY fc.id, s.id \
+                  """
+            self.cursor.execute(sql, (fabricacion_codigo,))
             calculation_data = []
-            for prod_codigo, cantidad in contenido:
-                self.cursor.execute("SELECT * FROM productos WHERE codigo = ?", (prod_codigo,))
-                prod_details = self.cursor.fetchone()
-                if not prod_details: continue
-
-                prod_dict = {
-                    "codigo": prod_details[0], "descripcion": prod_details[1], "departamento": prod_details[2],
-                    "tipo_trabajador": prod_details[3], "donde": prod_details[4],
-                    "tiene_subfabricaciones": prod_details[5],
-                    "tiempo_optimo": prod_details[6], "cantidad_en_kit": cantidad, "sub_partes": []
-                }
-                if prod_dict["tiene_subfabricaciones"] == 1:
-                    self.cursor.execute(
-                        "SELECT descripcion, tiempo, tipo_trabajador FROM subfabricaciones WHERE producto_codigo = ?",
-                        (prod_codigo,))
-                    sub_partes_raw = self.cursor.fetchall()
-                    for sub_raw in sub_partes_raw:
-                        prod_dict["sub_partes"].append(
-                            {"descripcion": sub_raw[0], "tiempo": sub_raw[1], "tipo_trabajador": sub_raw[2]})
-                calculation_data.append(prod_dict)
+            linea_actual, prod_dict = None, None
+            for row in self.cursor:
+                if row[0] != linea_actual:
+                    linea_actual = row[0]
+                    prod_dict = {
+                        "codigo": row[1], "descripcion": row[2], "departamento": row[3],
+                        "tipo_trabajador": row[4], "donde": row[5],
+                        "tiene_subfabricaciones": row[6],
+                        "tiempo_optimo": row[7], "cantidad_en_kit": row[8], "sub_partes": [],
+                        "tiempo_real": row[7] * WORKLOAD_OVERHEAD if row[7] is not None else None
+                    }
+                    calculation_data.append(prod_dict)
+                if row[9] is not None:
+                    prod_dict["sub_partes"].append(
+                        {"descripcion": row[9], "tiempo": row[10], "tipo_trabajador": row[11],
+                         "tiempo_real": row[10] * WORKLOAD_OVERHEAD})
             return calculation_data
         except sqlite3.Error as e:
             logging.error(f"Error de BD al recopilar datos para el cálculo de '{fabricacion_codigo}': {e}")
@@ -2,16 +2,19 @@
 import configparser
 import gc
 import logging
+import math
 import os
-import shutil
 import sys
 import sqlite3
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import messagebox, filedialog
 from datetime import datetime # Asegúrate de que datetime esté importado correctamente
 
 import customtkinter as ctk
-import pandas as pd
 import requests
+import xlsxwriter
 from tkcalendar import DateEntry
 
 # Importaciones de tus módulos locales
@@ -19,6 +22,13 @@ from calendar_helper import count_workdays, is_workday, get_non_work_plot_bands
 from simulation_engine import Scheduler, Task, ResourceManager # noinspection PyUnresolvedReferences
 from database_manager import DatabaseManager
 
+# Tabla de traducción para aceptar la coma como separador decimal en los tiempos
+_DEC_TR = str.maketrans({",": "."})
+
+# Opciones compartidas por los desplegables de los formularios
+DEPARTAMENTOS = ["Mecánica", "Electrónica", "Montaje"]
+TIPOS_TRABAJADOR = ["Tipo 1", "Tipo 2", "Tipo 3"]
+
 
 def resource_path(relative_path):
     """Obtiene la ruta absoluta al recurso, funciona para desarrollo y para PyInstaller."""
@@ -30,6 +40,16 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
+def after_future(widget, future, callback, interval_ms=20):
+    """
+    Invoca callback(future) en el hilo de Tk cuando el futuro termine.
+    Se sondea con after() para no tocar ningún widget desde el hilo de trabajo.
+    """
+    if future.done():
+        callback(future)
+    else:
+        widget.after(interval_ms, after_future, widget, future, callback, interval_ms)
+
 def create_gantt_chart(planned_tasks, units, annotations=None): # <-- Añadido annotations=None aquí
     """
     Toma una lista de tareas ya planificadas y genera un Gráfico Gantt con Highcharts.
@@ -168,7 +188,9 @@ class SubfabricacionesWindow(ctk.CTkToplevel):
         self.title("Añadir/Editar Subfabricaciones")
         self.geometry("600x500")
         self.transient(parent)
-        self.grab_set()
+        # La ventana se reutiliza: cerrar sólo la oculta y avisa a run() mediante esta variable
+        self.protocol("WM_DELETE_WINDOW", self.save_and_close)
+        self._closed_var = ctk.IntVar(self, value=0)
 
         self.subfabricaciones = (
             existing_subfabricaciones if existing_subfabricaciones else []
@@ -198,7 +220,7 @@ class SubfabricacionesWindow(ctk.CTkToplevel):
         self.worker_label = ctk.CTkLabel(self.entry_frame, text="Trabajador:")
         self.worker_label.grid(row=2, column=0, padx=5, pady=5, sticky="w")
         self.worker_menu = ctk.CTkOptionMenu(
-            self.entry_frame, values=["Tipo 1", "Tipo 2", "Tipo 3"]
+            self.entry_frame, values=TIPOS_TRABAJADOR
         )
         self.worker_menu.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
 
@@ -239,12 +261,12 @@ class SubfabricacionesWindow(ctk.CTkToplevel):
             return
 
         try:
-            tiempo = float(tiempo_str.replace(",", "."))
+            tiempo = float(tiempo_str.translate(_DEC_TR))
         except ValueError:
             messagebox.showerror("Error", "El tiempo debe ser un número.", parent=self)
             return
 
-        worker_type = int(worker_str.split(" ")[1])
+        worker_type = int(worker_str.rsplit(" ", 1)[1])
         new_sub = {
             "descripcion": desc,
             "tiempo": tiempo,
@@ -260,20 +282,40 @@ class SubfabricacionesWindow(ctk.CTkToplevel):
     def update_textbox(self):
         self.sub_textbox.configure(state="normal")
         self.sub_textbox.delete("1.0", "end")
+        # Se compone todo el texto y se inserta de una vez
+        lines = []
         total_time = 0
         for i, sub in enumerate(self.subfabricaciones):
-            self.sub_textbox.insert(
-                "end",
-                f"{i+1}. {sub['descripcion']} - {sub['tiempo']} min (Trabajador Tipo {sub['tipo_trabajador']})\n",
+            lines.append(
+                f"{i+1}. {sub['descripcion']} - {sub['tiempo']} min (Trabajador Tipo {sub['tipo_trabajador']})\n"
             )
             total_time += sub["tiempo"]
-        self.sub_textbox.insert(
-            "end", f"\n--- TIEMPO TOTAL: {total_time:.2f} minutos ---"
-        )
+        lines.append(f"\n--- TIEMPO TOTAL: {total_time:.2f} minutos ---")
+        self.sub_textbox.insert("end", "".join(lines))
         self.sub_textbox.configure(state="disabled")
 
+    def reset(self, existing_subfabricaciones=None):
+        """Prepara la ventana para editar otra lista sin volver a crear sus widgets."""
+        self.subfabricaciones = (
+            existing_subfabricaciones if existing_subfabricaciones else []
+        )
+        self.desc_entry.delete(0, "end")
+        self.tiempo_entry.delete(0, "end")
+        self.worker_menu.set("Tipo 1")
+        self.update_textbox()
+
+    def run(self):
+        """Muestra la ventana de forma modal y devuelve la lista al cerrarla."""
+        self.deiconify()
+        self.lift()
+        self.grab_set()
+        self.wait_variable(self._closed_var)
+        return self.subfabricaciones
+
     def save_and_close(self):
-        self.destroy()
+        self.grab_release()
+        self.withdraw()
+        self._closed_var.set(self._closed_var.get() + 1)
 
 
 # =================================================================================
@@ -284,6 +326,7 @@ class AddProductFrame(ctk.CTkFrame):
         super().__init__(parent)
         self.db_manager = db_manager
         self.subfabricaciones_data = []
+        self._sub_window = None  # SubfabricacionesWindow oculta, creada la primera vez
 
         self.grid_columnconfigure(1, weight=1)
 
@@ -310,7 +353,7 @@ class AddProductFrame(ctk.CTkFrame):
             row=3, column=0, padx=20, pady=10, sticky="w"
         )
         self.departamento_menu = ctk.CTkOptionMenu(
-            self, values=["Mecánica", "Electrónica", "Montaje"]
+            self, values=DEPARTAMENTOS
         )
         self.departamento_menu.grid(row=3, column=1, padx=20, pady=10, sticky="ew")
 
@@ -318,7 +361,7 @@ class AddProductFrame(ctk.CTkFrame):
             row=4, column=0, padx=20, pady=10, sticky="w"
         )
         self.trabajador_menu = ctk.CTkOptionMenu(
-            self, values=["Tipo 1", "Tipo 2", "Tipo 3"]
+            self, values=TIPOS_TRABAJADOR
         )
         self.trabajador_menu.grid(row=4, column=1, padx=20, pady=10, sticky="ew")
 
@@ -387,7 +430,7 @@ class AddProductFrame(ctk.CTkFrame):
             # --- LÓGICA AÑADIDA AQUÍ ---
             # Actualizamos el texto de la etiqueta para dar feedback visual
             count = len(self.subfabricaciones_data)
-            total_time = sum(s["tiempo"] for s in self.subfabricaciones_data)
+            total_time = math.fsum(s["tiempo"] for s in self.subfabricaciones_data)
             if count > 0:
                 self.sub_info_label.configure(
                     text=f"{count} parte(s) añadidas. Tiempo total: {total_time:.2f} min."
@@ -398,16 +441,14 @@ class AddProductFrame(ctk.CTkFrame):
                 )
 
     def open_sub_window(self):
+        # Se reutiliza la misma ventana emergente; sólo se crea la primera vez
+        if self._sub_window is None or not self._sub_window.winfo_exists():
+            self._sub_window = SubfabricacionesWindow(self)
         # Pasamos la lista de datos actual a la ventana emergente
-        sub_window = SubfabricacionesWindow(
-            self, existing_subfabricaciones=self.subfabricaciones_data
-        )
+        self._sub_window.reset(self.subfabricaciones_data)
 
-        # Esta línea es la clave: el código se detiene aquí hasta que la ventana emergente se cierre
-        self.wait_window(sub_window)
-
-        # Una vez cerrada, recogemos los datos actualizados
-        self.subfabricaciones_data = sub_window.subfabricaciones
+        # run() no vuelve hasta que la ventana emergente se cierre; entonces recogemos los datos
+        self.subfabricaciones_data = self._sub_window.run()
         self.toggle_sub_mode()  # Actualizamos la info en la pantalla principal
 
     def save_product(self):
@@ -433,9 +474,9 @@ class AddProductFrame(ctk.CTkFrame):
         if data["tiene_subfabricaciones"] == 0:
             try:
                 data["tiempo_optimo"] = float(
-                    self.tiempo_optimo_entry.get().replace(",", ".")
+                    self.tiempo_optimo_entry.get().translate(_DEC_TR)
                 )
-                data["tipo_trabajador"] = int(self.trabajador_menu.get().split(" ")[1])
+                data["tipo_trabajador"] = int(self.trabajador_menu.get().rsplit(" ", 1)[1])
                 sub_data = None
             except (ValueError, IndexError):
                 logging.warning(
@@ -456,10 +497,15 @@ class AddProductFrame(ctk.CTkFrame):
                     "Si marca 'Tiene subfabricaciones', debe añadir al menos una parte.",
                 )
                 return
-            data["tiempo_optimo"] = sum(s["tiempo"] for s in self.subfabricaciones_data)
-            data["tipo_trabajador"] = min(
-                s["tipo_trabajador"] for s in self.subfabricaciones_data
-            )
+            # Una sola pasada: tiempo total y tipo mínimo.
+            tiempo_total = 0.0
+            tipo_min = None
+            for s in self.subfabricaciones_data:
+                tiempo_total += s["tiempo"]
+                if tipo_min is None or s["tipo_trabajador"] < tipo_min:
+                    tipo_min = s["tipo_trabajador"]
+            data["tiempo_optimo"] = tiempo_total
+            data["tipo_trabajador"] = tipo_min
             sub_data = self.subfabricaciones_data
 
         if self.db_manager.add_product(data, sub_data):
@@ -513,7 +559,7 @@ class CreateFabricacionFrame(ctk.CTkFrame):
         self.fab_desc_entry = ctk.CTkEntry(self.top_frame, placeholder_text="Ej: Kit de Montaje Final PC")
         self.fab_desc_entry.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
 
-        ctk.CTkLabel(self.top_frame, text="─" * 80).grid(row=2, column=0, columnspan=2, pady=5)
+        ctk.CTkFrame(self.top_frame, height=2, fg_color="gray70").grid(row=2, column=0, columnspan=2, padx=10, pady=5, sticky="ew")
 
         ctk.CTkLabel(self.top_frame, text="Buscar Producto:").grid(row=3, column=0, padx=10, pady=5, sticky="w")
         self.search_entry = ctk.CTkEntry(self.top_frame, placeholder_text="Escriba código o descripción del producto...")
@@ -554,8 +600,7 @@ class CreateFabricacionFrame(ctk.CTkFrame):
         if len(query) < 2:
             return
         results = self.db_manager.search_products(query)
-        for codigo, descripcion in results:
-            text = f"{codigo} - {descripcion}"
+        for codigo, _, text in results:
             label = ctk.CTkLabel(self.search_results_frame, text=text, cursor="hand2", anchor="w")
             label.pack(fill="x", padx=5)
             label.bind("<Button-1>", lambda e, c=codigo, t=text: self.select_product(c, t))
@@ -601,9 +646,8 @@ class CreateFabricacionFrame(ctk.CTkFrame):
         if not self.contenido_actual:
             self.content_textbox.insert("1.0", "Añada productos para verlos aquí...")
         else:
-            for item in self.contenido_actual:
-                line = f"CANT: {item['cantidad']:<5} | {item['producto_texto']}\n"
-                self.content_textbox.insert("end", line)
+            text = "".join(f"CANT: {item['cantidad']:<5} | {item['producto_texto']}\n" for item in self.contenido_actual)
+            self.content_textbox.insert("end", text)
         self.content_textbox.configure(state="disabled")
 
     def clear_list(self):
@@ -645,11 +689,39 @@ class CreateFabricacionFrame(ctk.CTkFrame):
 # =================================================================================
 # CLASE PARA LA PANTALLA "EDITAR / VISUALIZAR" (TOTALMENTE REESTRUCTURADA)
 # =================================================================================
+# Campos simples de los formularios de edición: (fila, etiqueta, clave, fábrica del widget).
+# La fábrica recibe el formulario y la StringVar del campo (los CTkTextbox no admiten variable).
+PRODUCT_FIELDS = (
+    (1, "Código:", "codigo", lambda form, var: ctk.CTkEntry(form, textvariable=var)),
+    (2, "Descripción:", "descripcion", lambda form, var: ctk.CTkEntry(form, textvariable=var)),
+    (3, "Departamento:", "departamento", lambda form, var: ctk.CTkOptionMenu(form, values=DEPARTAMENTOS, variable=var)),
+    (5, "Dónde se ubica:", "donde", lambda form, var: ctk.CTkTextbox(form, height=80)),
+)
+FABRICACION_FIELDS = (
+    (1, "Código:", "codigo", lambda form, var: ctk.CTkEntry(form, textvariable=var)),
+    (2, "Descripción:", "descripcion", lambda form, var: ctk.CTkEntry(form, textvariable=var)),
+)
+
+
+class _Subs:
+    """Columnas tiempo/tipo de las subfabricaciones en edición, para calcular los agregados."""
+    __slots__ = ("tiempos", "tipos")
+
+    def __init__(self, subfabricaciones=()):
+        self.tiempos = array("d", [s["tiempo"] for s in subfabricaciones])
+        self.tipos = array("i", [s["tipo_trabajador"] for s in subfabricaciones])
+
+
 class EditFrame(ctk.CTkFrame):
+    _TITLE_FONT = None  # Se crea al construir el primer formulario (requiere la ventana raíz)
+    _RESULTS_BATCH = 30  # Filas de resultado que se empaquetan cada vez que el scroll llega al final
+
     def __init__(self, parent, db_manager):
         super().__init__(parent)
         self.db_manager = db_manager
         self.subfabricaciones_data = []
+        self.subs = _Subs()  # Vista por columnas de subfabricaciones_data; se rehace al cambiar la lista
+        self._sub_window = None  # SubfabricacionesWindow oculta, creada la primera vez
         self.contenido_actual = []
         self.grid_columnconfigure(0, weight=1); self.grid_rowconfigure(1, weight=1)
         search_frame = ctk.CTkFrame(self); search_frame.grid(row=0, column=0, padx=20, pady=20, sticky="ew")
@@ -659,85 +731,217 @@ class EditFrame(ctk.CTkFrame):
         self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="Buscar por código o descripción...")
         self.search_entry.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
         self.search_entry.bind("<KeyRelease>", self.update_search_results)
+        self._search_job = None  # Búsqueda pendiente (debounce de <KeyRelease>)
+        self._search_cache = OrderedDict()  # LRU (tipo, texto) -> resultados
+        self._search_cache_changes = None  # db_manager.change_token() al llenar la caché
+        self._row_pool = []  # Etiquetas de resultado reutilizables entre búsquedas
+        self._row_codigo = {}  # Etiqueta del pool -> código que muestra actualmente
+        # Las lecturas de detalle se hacen fuera del hilo de Tk; _pending_item descarta respuestas obsoletas
+        self._db_executor = ThreadPoolExecutor(max_workers=1)
+        self._pending_item = None
+        # El formulario se conserva mientras se editen elementos del mismo tipo
+        self._active_form_kind = None
+        self._edit_codigo = None
+        self._loaded_item = None  # (tipo, código) mostrado en el formulario, para no recargarlo
         self.content_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.content_frame.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="nsew")
         self.content_frame.grid_columnconfigure(0, weight=2, uniform="group1"); self.content_frame.grid_columnconfigure(1, weight=3, uniform="group1"); self.content_frame.grid_rowconfigure(0, weight=1)
         self.results_frame = ctk.CTkScrollableFrame(self.content_frame, label_text="Resultados")
         self.results_frame.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
+        # Sólo se empaquetan las filas visibles; al acercarse al final del scroll se muestran más
+        self._results = []
+        self._shown_rows = 0
+        self._results_scrollbar_set = self.results_frame._scrollbar.set
+        self.results_frame._parent_canvas.configure(yscrollcommand=self._on_results_scroll)
         self.edit_area_frame = ctk.CTkFrame(self.content_frame)
 
         # --- NUEVO: Inicializar los atributos del formulario a None ---
+        # Widgets de los campos simples (PRODUCT_FIELDS / FABRICACION_FIELDS) y sus variables por clave
+        self.form_widgets = {}
+        self.form_vars = {}
+
         # Atributos para productos
-        self.p_codigo_entry = None
-        self.p_desc_entry = None
-        self.p_departamento_menu = None
-        self.p_donde_textbox = None
         self.p_sub_frame = None
         self.p_tiene_sub_var = None
         self.p_sub_switch = None
         self.p_tiempo_optimo_label = None
         self.p_tiempo_optimo_entry = None
         self.p_trabajador_menu = None
+        self.p_tiempo_var = None
+        self.p_trabajador_var = None
         self.p_add_sub_button = None
         self.p_sub_info_label = None
 
         # Atributos para fabricaciones
-        self.f_codigo_entry = None
-        self.f_desc_entry = None
         self.f_content_textbox = None
 
     def clear_search(self, _value=None):
+        if self._search_job: self.after_cancel(self._search_job); self._search_job = None
+        self._pending_item = None; self._loaded_item = None
+        self.db_manager.clear_details_cache()
         self.search_entry.delete(0, "end")
-        for widget in self.results_frame.winfo_children():
-            widget.destroy()
+        self._render_results([])
         self.edit_area_frame.grid_forget()
 
     def update_search_results(self, _event=None):
+        # Se reprograma en cada pulsación: sólo la última de una ráfaga llega a consultar la BD
+        if self._search_job: self.after_cancel(self._search_job)
+        self._search_job = self.after(150, self._do_search)
+
+    def _do_search(self):
+        self._search_job = None
         query = self.search_entry.get()
         search_type = self.search_type_var.get()
-        for widget in self.results_frame.winfo_children():
-            widget.destroy()
         self.edit_area_frame.grid_forget()
-        if len(query) < 2: return
-        results = self.db_manager.search_products(query) if search_type == "Productos" else self.db_manager.search_fabricaciones(query)
-        for codigo, descripcion in results:
-            text = f"{codigo} | {descripcion}"
-            label = ctk.CTkLabel(self.results_frame, text=text, cursor="hand2", anchor="w")
-            label.pack(fill="x", padx=5, pady=2)
-            label.bind("<Button-1>", lambda e, c=codigo: self.load_item_for_edit(c))
+        self._render_results(self._cached_search(search_type, query) if len(query) >= 2 else [])
+
+    def _make_row(self):
+        row = ctk.CTkLabel(self.results_frame, text="", cursor="hand2", anchor="w")
+        # Un único binding por fila, creado una sola vez; el código se resuelve al hacer clic
+        row.bind("<Button-1>", lambda e, r=row: self._on_row_click(r))
+        self._row_pool.append(row)
+        return row
+
+    def _on_row_click(self, row):
+        codigo = self._row_codigo.get(row)
+        if codigo is not None: self.load_item_for_edit(codigo)
+
+    def _render_results(self, results):
+        """Muestra los resultados reconfigurando las etiquetas del pool en lugar de recrearlas."""
+        self._results = results
+        self._shown_rows = min(len(results), self._RESULTS_BATCH)
+        self._show_rows(0, self._shown_rows)
+        for row in self._row_pool[self._shown_rows:]:
+            self._row_codigo.pop(row, None)
+            row.pack_forget()
+        self.results_frame._parent_canvas.yview_moveto(0)
+
+    def _show_rows(self, start, stop):
+        for i in range(start, stop):
+            codigo, _, texto = self._results[i]
+            row = self._row_pool[i] if i < len(self._row_pool) else self._make_row()
+            row.configure(text=texto)
+            self._row_codigo[row] = codigo
+            row.pack(fill="x", padx=5, pady=2)
+
+    def _on_results_scroll(self, first, last):
+        self._results_scrollbar_set(first, last)
+        if float(last) > 0.9 and self._shown_rows < len(self._results):
+            stop = min(len(self._results), self._shown_rows + self._RESULTS_BATCH)
+            self._show_rows(self._shown_rows, stop); self._shown_rows = stop
+
+    def _cached_search(self, search_type, query):
+        """Devuelve los resultados de búsqueda reutilizando los de prefijos ya tecleados."""
+        # Cualquier escritura en la BD (desde esta u otra pantalla, o desde otro equipo) invalida la caché completa
+        changes = self.db_manager.change_token()
+        if changes != self._search_cache_changes:
+            self._search_cache.clear(); self._search_cache_changes = changes
+        key = (search_type, query)
+        if key in self._search_cache:
+            self._search_cache.move_to_end(key)
+            return self._search_cache[key]
+        search = self.db_manager.search_products if search_type == "Productos" else self.db_manager.search_fabricaciones
+        results = search(query, separador=" | ")
+        self._search_cache[key] = results
+        if len(self._search_cache) > 64: self._search_cache.popitem(last=False)
+        return results
 
     def load_item_for_edit(self, codigo):
         search_type = self.search_type_var.get()
+        item = (search_type, codigo)
+        if item == self._pending_item: return  # Ya se está cargando
+        if item == self._loaded_item:
+            # Mismo elemento ya cargado: se vuelve a mostrar y se descarta cualquier otra lectura en curso
+            self._pending_item = None
+            self.edit_area_frame.grid(row=0, column=1, padx=(20, 0), pady=0, sticky="nsew"); return
+        self._pending_item = item
+        if search_type != self._active_form_kind:
+            self._reset_edit_area()
+            ctk.CTkLabel(self.edit_area_frame, text="Cargando...", text_color="gray").grid(row=0, column=0, columnspan=2, pady=10)
+        self.edit_area_frame.grid(row=0, column=1, padx=(20, 0), pady=0, sticky="nsew")
+        fetch = self.db_manager.get_product_details if search_type == "Productos" else self.db_manager.get_fabricacion_details
+        future = self._db_executor.submit(fetch, codigo)
+        after_future(self, future, lambda f: self._on_item_loaded(search_type, codigo, f))
+
+    def _on_item_loaded(self, search_type, codigo, future):
+        if self._pending_item != (search_type, codigo): return  # El usuario ya pidió otro elemento
+        self._pending_item = None
+        e = future.exception()
+        if e is not None:
+            # Se deja de mostrar "Cargando..." y el elemento se puede volver a pedir
+            logging.error(f"Error al cargar '{codigo}' para editar: {e}")
+            self._reset_edit_area()
+            messagebox.showerror("Error", f"No se pudo cargar '{codigo}':\n{e}"); return
+        details = future.result()
+        if not details[0]: self._reset_edit_area(); return  # El elemento ya no existe
+        if search_type != self._active_form_kind:
+            # Sólo se reconstruye el formulario al cambiar entre Producto y Fabricación
+            self._reset_edit_area()
+            if search_type == "Productos": self.create_product_edit_form()
+            else: self.create_fabricacion_edit_form()
+            self._active_form_kind = search_type
+        self._edit_codigo = codigo; self._loaded_item = (search_type, codigo)
+        if search_type == "Productos": self._populate_product_form(*details)
+        else: self._populate_fabricacion_form(*details)
+
+    @classmethod
+    def _title_font(cls):
+        if cls._TITLE_FONT is None: cls._TITLE_FONT = ctk.CTkFont(size=16, weight="bold")
+        return cls._TITLE_FONT
+
+    def _reset_edit_area(self):
         for widget in self.edit_area_frame.winfo_children():
             widget.destroy()
-        if search_type == "Productos":
-            self.create_product_edit_form(codigo)
-        else:
-            self.create_fabricacion_edit_form(codigo)
-        self.edit_area_frame.grid(row=0, column=1, padx=(20, 0), pady=0, sticky="nsew")
+        self._active_form_kind = None; self._loaded_item = None
 
-    def create_product_edit_form(self, codigo):
-        product_data, sub_data_raw = self.db_manager.get_product_details(codigo)
-        if not product_data: return
-        data = {"codigo": product_data[0], "descripcion": product_data[1], "departamento": product_data[2], "tipo_trabajador": product_data[3], "donde": product_data[4], "tiene_subfabricaciones": product_data[5], "tiempo_optimo": product_data[6]}
-        self.subfabricaciones_data = [{"descripcion": s[2], "tiempo": s[3], "tipo_trabajador": s[4]} for s in sub_data_raw]
+    def create_product_edit_form(self):
         form = self.edit_area_frame; form.grid_columnconfigure(1, weight=1)
-        ctk.CTkLabel(form, text="Editando Producto", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, pady=10)
-        ctk.CTkLabel(form, text="Departamento:").grid(row=3, column=0, padx=10, pady=5, sticky="w"); self.p_departamento_menu = ctk.CTkOptionMenu(form, values=["Mecánica", "Electrónica", "Montaje"])
-        self.p_departamento_menu.set(data["departamento"]); self.p_departamento_menu.grid(row=3, column=1, padx=10, pady=5, sticky="ew")
-        ctk.CTkLabel(form, text="Dónde se ubica:").grid(row=5, column=0, padx=10, pady=5, sticky="nw"); self.p_donde_textbox = ctk.CTkTextbox(form, height=80)
-        self.p_donde_textbox.grid(row=5, column=1, padx=10, pady=5, sticky="ew"); self.p_donde_textbox.insert("1.0", data["donde"] or "")
+        ctk.CTkLabel(form, text="Editando Producto", font=self._title_font()).grid(row=0, column=0, columnspan=2, pady=10)
+        self._build_form(PRODUCT_FIELDS)
         self.p_sub_frame = ctk.CTkFrame(form, fg_color="transparent"); self.p_sub_frame.grid(row=6, column=0, columnspan=2, padx=10, pady=5, sticky="ew")
-        self.p_sub_frame.grid_columnconfigure(1, weight=1); self.p_tiene_sub_var = ctk.IntVar(value=data["tiene_subfabricaciones"])
+        self.p_sub_frame.grid_columnconfigure(1, weight=1); self.p_tiene_sub_var = ctk.IntVar(value=0)
         self.p_sub_switch = ctk.CTkSwitch(self.p_sub_frame, text="¿Tiene subfabricaciones?", variable=self.p_tiene_sub_var, command=self._p_toggle_sub_mode)
         self.p_sub_switch.grid(row=0, column=0, padx=10); self.p_tiempo_optimo_label = ctk.CTkLabel(self.p_sub_frame, text="Tiempo Óptimo (min):")
-        self.p_tiempo_optimo_entry = ctk.CTkEntry(self.p_sub_frame); self.p_tiempo_optimo_entry.insert(0, str(data["tiempo_optimo"]))
-        self.p_trabajador_menu = ctk.CTkOptionMenu(self.p_sub_frame, values=["Tipo 1", "Tipo 2", "Tipo 3"]); self.p_trabajador_menu.set(f"Tipo {data['tipo_trabajador']}")
+        self.p_tiempo_var = ctk.StringVar(form); self.p_trabajador_var = ctk.StringVar(form)
+        self.p_tiempo_optimo_entry = ctk.CTkEntry(self.p_sub_frame, textvariable=self.p_tiempo_var)
+        self.p_trabajador_menu = ctk.CTkOptionMenu(self.p_sub_frame, values=TIPOS_TRABAJADOR, variable=self.p_trabajador_var)
         self.p_add_sub_button = ctk.CTkButton(self.p_sub_frame, text="Añadir/Editar Subfabricaciones", command=self._p_open_sub_window)
-        self.p_sub_info_label = ctk.CTkLabel(self.p_sub_frame, text="", text_color="gray"); self._p_toggle_sub_mode()
+        self.p_sub_info_label = ctk.CTkLabel(self.p_sub_frame, text="", text_color="gray")
         btn_frame = ctk.CTkFrame(form, fg_color="transparent"); btn_frame.grid(row=10, column=0, columnspan=2, pady=20, sticky="e")
-        ctk.CTkButton(btn_frame, text="Guardar Cambios", command=lambda: self.save_product_changes(codigo)).pack(side="left", padx=5)
-        ctk.CTkButton(btn_frame, text="Eliminar", fg_color="#E74C3C", hover_color="#C0392B", command=lambda: self.delete_product(codigo)).pack(side="left", padx=5)
+        ctk.CTkButton(btn_frame, text="Guardar Cambios", command=lambda: self.save_product_changes(self._edit_codigo)).pack(side="left", padx=5)
+        ctk.CTkButton(btn_frame, text="Eliminar", fg_color="#E74C3C", hover_color="#C0392B", command=lambda: self.delete_product(self._edit_codigo)).pack(side="left", padx=5)
+
+    def _populate_product_form(self, product_data, sub_data_raw):
+        data = {"codigo": product_data[0], "descripcion": product_data[1], "departamento": product_data[2], "tipo_trabajador": product_data[3], "donde": product_data[4], "tiene_subfabricaciones": product_data[5], "tiempo_optimo": product_data[6]}
+        self.subfabricaciones_data = [{"descripcion": s[2], "tiempo": s[3], "tipo_trabajador": s[4]} for s in sub_data_raw]
+        self.subs = _Subs(self.subfabricaciones_data)
+        self._populate_form(data)
+        self.p_tiene_sub_var.set(data["tiene_subfabricaciones"])
+        self.p_tiempo_var.set(str(data["tiempo_optimo"]))
+        self.p_trabajador_var.set(f"Tipo {data['tipo_trabajador']}"); self._p_toggle_sub_mode()
+
+    def _build_form(self, spec):
+        """Crea las filas etiqueta/widget descritas en spec; los valores se cargan con _populate_form."""
+        form = self.edit_area_frame
+        self.form_widgets = {}; self.form_vars = {}
+        for row, label_text, key, factory in spec:
+            var = ctk.StringVar(form); widget = factory(form, var)
+            ctk.CTkLabel(form, text=label_text).grid(row=row, column=0, padx=10, pady=5, sticky="nw" if isinstance(widget, ctk.CTkTextbox) else "w")
+            widget.grid(row=row, column=1, padx=10, pady=5, sticky="ew")
+            self.form_widgets[key] = widget
+            if not isinstance(widget, ctk.CTkTextbox): self.form_vars[key] = var
+
+    def _populate_form(self, data):
+        for key, widget in self.form_widgets.items():
+            var = self.form_vars.get(key)
+            # Un solo set() sobre la variable en lugar de delete + insert en el widget
+            if var is not None: var.set(str(data[key]))
+            else: widget.delete("1.0", "end"); widget.insert("1.0", data[key] or "")
+
+    def _get_field(self, key):
+        var = self.form_vars.get(key)
+        if var is not None: return var.get().strip()
+        return self.form_widgets[key].get("1.0", "end-1c").strip()
 
     def _p_toggle_sub_mode(self):
         if self.p_tiene_sub_var.get() == 0:
@@ -748,24 +952,25 @@ class EditFrame(ctk.CTkFrame):
             self.p_tiempo_optimo_label.grid_remove(); self.p_tiempo_optimo_entry.grid_remove()
             self.p_trabajador_menu.configure(state="disabled"); self.p_add_sub_button.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
             self.p_sub_info_label.grid(row=2, column=1, padx=10, sticky="w")
-            count = len(self.subfabricaciones_data); total_time = sum(s["tiempo"] for s in self.subfabricaciones_data)
+            count = len(self.subs.tiempos); total_time = math.fsum(self.subs.tiempos)
             self.p_sub_info_label.configure(text=f"{count} parte(s). Tiempo total: {total_time:.2f} min.")
 
     def _p_open_sub_window(self):
-        sub_window = SubfabricacionesWindow(self, existing_subfabricaciones=self.subfabricaciones_data)
-        self.wait_window(sub_window); self.subfabricaciones_data = sub_window.subfabricaciones; self._p_toggle_sub_mode()
+        if self._sub_window is None or not self._sub_window.winfo_exists(): self._sub_window = SubfabricacionesWindow(self)
+        self._sub_window.reset(self.subfabricaciones_data); self.subfabricaciones_data = self._sub_window.run()
+        self.subs = _Subs(self.subfabricaciones_data); self._p_toggle_sub_mode()
 
     def save_product_changes(self, original_codigo):
-        new_data = {"codigo": self.p_codigo_entry.get().strip(), "descripcion": self.p_desc_entry.get().strip(), "departamento": self.p_departamento_menu.get(),
-                    "donde": self.p_donde_textbox.get("1.0", "end-1c").strip(), "tiene_subfabricaciones": self.p_tiene_sub_var.get()}
+        new_data = {key: self._get_field(key) for _, _, key, _ in PRODUCT_FIELDS}
+        new_data["tiene_subfabricaciones"] = self.p_tiene_sub_var.get()
         if not new_data["codigo"] or not new_data["descripcion"]: messagebox.showerror("Error de Validación", "El código y la descripción son obligatorios."); return
         if new_data["tiene_subfabricaciones"] == 0:
             try:
-                new_data["tiempo_optimo"] = float(self.p_tiempo_optimo_entry.get().replace(",", ".")); new_data["tipo_trabajador"] = int(self.p_trabajador_menu.get().split(" ")[1])
+                new_data["tiempo_optimo"] = float(self.p_tiempo_var.get().translate(_DEC_TR)); new_data["tipo_trabajador"] = int(self.p_trabajador_var.get().rsplit(" ", 1)[1])
             except (ValueError, IndexError): messagebox.showerror("Error de Validación", "El tiempo óptimo debe ser un número válido."); return
         else:
             if not self.subfabricaciones_data: messagebox.showerror("Error de Validación", "Si marca 'Tiene subfabricaciones', debe añadir al menos una parte."); return
-            new_data["tiempo_optimo"] = sum(s["tiempo"] for s in self.subfabricaciones_data); new_data["tipo_trabajador"] = min(s["tipo_trabajador"] for s in self.subfabricaciones_data)
+            new_data["tiempo_optimo"] = math.fsum(self.subs.tiempos); new_data["tipo_trabajador"] = min(self.subs.tipos)
         if self.db_manager.update_product(original_codigo, new_data, self.subfabricaciones_data):
             messagebox.showinfo("Éxito", "Producto actualizado correctamente."); self.clear_search()
         else: messagebox.showerror("Error", "No se pudo actualizar el producto.")
@@ -775,30 +980,29 @@ class EditFrame(ctk.CTkFrame):
             if self.db_manager.delete_product(codigo): messagebox.showinfo("Éxito", "Producto eliminado correctamente."); self.clear_search()
             else: messagebox.showerror("Error", "No se pudo eliminar el producto.")
 
-    def create_fabricacion_edit_form(self, codigo):
-        fab_data, contenido_raw = self.db_manager.get_fabricacion_details(codigo)
-        if not fab_data: return
-        data = {"codigo": fab_data[0], "descripcion": fab_data[1]}
-        self.contenido_actual = [{"producto_codigo": c[0], "producto_texto": f"{c[0]} - {c[1]}", "cantidad": c[2]} for c in contenido_raw]
+    def create_fabricacion_edit_form(self):
         form = self.edit_area_frame; form.grid_columnconfigure(1, weight=1)
-        ctk.CTkLabel(form, text="Editando Fabricación", font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, columnspan=2, pady=10)
-        ctk.CTkLabel(form, text="Código:").grid(row=1, column=0, padx=10, pady=5, sticky="w"); self.f_codigo_entry = ctk.CTkEntry(form)
-        self.f_codigo_entry.grid(row=1, column=1, padx=10, pady=5, sticky="ew"); self.f_codigo_entry.insert(0, data["codigo"])
-        ctk.CTkLabel(form, text="Descripción:").grid(row=2, column=0, padx=10, pady=5, sticky="w"); self.f_desc_entry = ctk.CTkEntry(form)
-        self.f_desc_entry.grid(row=2, column=1, padx=10, pady=5, sticky="ew"); self.f_desc_entry.insert(0, data["descripcion"])
+        ctk.CTkLabel(form, text="Editando Fabricación", font=self._title_font()).grid(row=0, column=0, columnspan=2, pady=10)
+        self._build_form(FABRICACION_FIELDS)
         ctk.CTkLabel(form, text="Contenido:").grid(row=3, column=0, padx=10, pady=5, sticky="nw")
         self.f_content_textbox = ctk.CTkTextbox(form)  # Se asume que height=200 es el valor por defecto.
+        self.f_content_textbox.grid(row=3, column=1, padx=10, pady=5, sticky="nsew")
         btn_frame = ctk.CTkFrame(form, fg_color="transparent"); btn_frame.grid(row=10, column=0, columnspan=2, pady=10, sticky="ew")
-        ctk.CTkButton(btn_frame, text="Guardar Cambios", command=lambda: self.save_fabricacion_changes(codigo)).pack(side="right", padx=10)
-        ctk.CTkButton(btn_frame, text="Eliminar", fg_color="#E74C3C", hover_color="#C0392B", command=lambda: self.delete_fabricacion(codigo)).pack(side="right", padx=10)
+        ctk.CTkButton(btn_frame, text="Guardar Cambios", command=lambda: self.save_fabricacion_changes(self._edit_codigo)).pack(side="right", padx=10)
+        ctk.CTkButton(btn_frame, text="Eliminar", fg_color="#E74C3C", hover_color="#C0392B", command=lambda: self.delete_fabricacion(self._edit_codigo)).pack(side="right", padx=10)
+
+    def _populate_fabricacion_form(self, fab_data, contenido_raw):
+        self.contenido_actual = [{"producto_codigo": c[0], "producto_texto": f"{c[0]} - {c[1]}", "cantidad": c[2]} for c in contenido_raw]
+        self._populate_form({"codigo": fab_data[0], "descripcion": fab_data[1]})
+        self.update_fab_content_textbox()
 
     def update_fab_content_textbox(self):
+        text = "".join(f"CANT: {item['cantidad']:<5} | {item['producto_texto']}\n" for item in self.contenido_actual)
         self.f_content_textbox.configure(state="normal"); self.f_content_textbox.delete("1.0", "end")
-        for item in self.contenido_actual: self.f_content_textbox.insert("end", f"CANT: {item['cantidad']:<5} | {item['producto_texto']}\n")
-        self.f_content_textbox.configure(state="disabled")
+        self.f_content_textbox.insert("1.0", text); self.f_content_textbox.configure(state="disabled")
 
     def save_fabricacion_changes(self, original_codigo):
-        new_data = {"codigo": self.f_codigo_entry.get().strip(), "descripcion": self.f_desc_entry.get().strip()}
+        new_data = {key: self._get_field(key) for _, _, key, _ in FABRICACION_FIELDS}
         if self.db_manager.update_fabricacion(original_codigo, new_data, self.contenido_actual):
             messagebox.showinfo("Éxito", "Fabricación actualizada correctamente."); self.clear_search()
         else: messagebox.showerror("Error", "No se pudo actualizar la fabricación.")
@@ -881,7 +1085,7 @@ class DepartmentPlanningWindow(ctk.CTkToplevel):
             task_frame = ctk.CTkFrame(self.task_order_frame)
             task_frame.pack(fill="x", pady=2, padx=5)
             task_frame.grid_columnconfigure(1, weight=1)
-            task_duration = task["tiempo_optimo"] * 1.20 * self.units
+            task_duration = task["tiempo_real"] * self.units
             worker_type_req = task.get("tipo_trabajador", "N/A")
             label_text = (
                 f"T{worker_type_req} | {task['codigo']} ({task_duration:.2f} min tot)"
@@ -959,6 +1163,14 @@ class CalculateTimesFrame(ctk.CTkFrame):
         self.calculation_data = None
         self.department_plans = {}
         self.final_planned_tasks = None
+        # Datos de cálculo por fabricación; se vacía al seleccionar otra o si la BD cambia
+        self._calc_cache = {}
+        self._calc_cache_changes = None
+        # Lectura adelantada al seleccionar una fabricación: (código, db_manager.change_token(), future)
+        self._db_executor = ThreadPoolExecutor(max_workers=1)
+        self._calc_prefetch = None
+        # Exportación a Excel en su propio hilo: no hace esperar a las lecturas de la BD ni al revés
+        self._export_executor = ThreadPoolExecutor(max_workers=1)
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(3, weight=1)
@@ -971,6 +1183,10 @@ class CalculateTimesFrame(ctk.CTkFrame):
         self.fab_search_entry = ctk.CTkEntry(self.selection_frame, placeholder_text="Buscar fabricación a calcular...")
         self.fab_search_entry.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
         self.fab_search_entry.bind("<KeyRelease>", self.update_fab_search_results)
+        self._fab_search_job = None  # after() pendiente de la búsqueda (debounce)
+        self._last_fab_query = None  # Texto de la última búsqueda mostrada
+        self._fab_label_pool = []  # Etiquetas de resultado reutilizables entre búsquedas
+        self._fab_label_item = {}  # Etiqueta del pool -> (código, texto) que muestra
         self.selected_fab_code = None
         self.fab_search_results_frame = ctk.CTkFrame(self.selection_frame)
         self.fab_search_results_frame.grid(row=1, column=1, padx=10, sticky="ew")
@@ -1035,23 +1251,42 @@ class CalculateTimesFrame(ctk.CTkFrame):
                 entry.delete(0, "end")
 
     def update_fab_search_results(self, _event=None):
+        # Sólo la última pulsación de una ráfaga llega a consultar la BD
+        if self._fab_search_job: self.after_cancel(self._fab_search_job)
+        self._fab_search_job = self.after(150, self._do_fab_search)
+
+    def _do_fab_search(self):
+        self._fab_search_job = None
         query = self.fab_search_entry.get()
-        for widget in self.fab_search_results_frame.winfo_children():
-            widget.destroy()
-        if len(query) < 1: return
-        results = self.db_manager.search_fabricaciones(query)
-        for codigo, descripcion in results:
-            text = f"{codigo} - {descripcion}"
-            label = ctk.CTkLabel(self.fab_search_results_frame, text=text, cursor="hand2", anchor="w")
+        if query == self._last_fab_query: return  # p. ej. teclas de cursor: nada que recalcular
+        self._last_fab_query = query
+        # Búsqueda por prefijo (resuelta por índice) y acotada a lo que cabe en la lista desplegable
+        self._render_fab_results(self.db_manager.search_fabricaciones(query, prefijo=True, limite=25) if query else [])
+
+    def _render_fab_results(self, results):
+        """Reconfigura las etiquetas del pool con los resultados y oculta las sobrantes."""
+        pool = self._fab_label_pool
+        for i, (codigo, _, text) in enumerate(results):
+            if i == len(pool):
+                label = ctk.CTkLabel(self.fab_search_results_frame, text="", cursor="hand2", anchor="w")
+                # Un único binding por etiqueta; la fabricación se resuelve al hacer clic
+                label.bind("<Button-1>", lambda e, l=label: self.select_fabricacion(*self._fab_label_item[l]))
+                pool.append(label)
+            label = pool[i]
+            label.configure(text=text); self._fab_label_item[label] = (codigo, text)
             label.pack(fill="x", padx=5)
-            label.bind("<Button-1>", lambda e, c=codigo, t=text: self.select_fabricacion(c, t))
+        for label in pool[len(results):]:
+            label.pack_forget()
 
     def select_fabricacion(self, codigo, texto):
         self.selected_fab_code = codigo
+        self._calc_cache.clear(); self._last_fab_query = None
+        # Se adelanta la lectura mientras el usuario ajusta unidades y planifica
+        changes = self.db_manager.change_token()
+        self._calc_prefetch = (codigo, changes, self._db_executor.submit(self._read_calculation_data, self.db_manager, codigo))
         self.fab_search_entry.delete(0, "end")
         self.fab_search_entry.insert(0, texto)
-        for widget in self.fab_search_results_frame.winfo_children():
-            widget.destroy()
+        self._render_fab_results([])
         self.results_textbox.configure(state="normal")
         self.results_textbox.delete("1.0", "end")
         self.results_textbox.configure(state="disabled")
@@ -1072,16 +1307,42 @@ class CalculateTimesFrame(ctk.CTkFrame):
         except (ValueError, TypeError):
             messagebox.showerror("Error", "El número de unidades debe ser un entero positivo.")
             return None, None
-        self.calculation_data = self.db_manager.get_data_for_calculation(self.selected_fab_code)
+        self.calculation_data, tasks_by_dept = self._load_calculation_data(self.selected_fab_code)
         if not self.calculation_data:
             messagebox.showerror("Error", "No se pudieron cargar los datos para esta fabricación.")
             return None, None
-        return units, self.calculation_data
+        return units, tasks_by_dept
+
+    def _load_calculation_data(self, codigo):
+        """Devuelve (datos, tareas por departamento) de la fabricación, reutilizando la lectura anterior si la
+        BD no ha cambiado (ni por esta aplicación ni por otra conexión)."""
+        changes = self.db_manager.change_token()
+        if changes != self._calc_cache_changes:
+            self._calc_cache.clear(); self._calc_cache_changes = changes
+        cached = self._calc_cache.get(codigo)
+        if cached is None:
+            prefetch, self._calc_prefetch = self._calc_prefetch, None
+            # La lectura adelantada sólo vale si la BD no ha cambiado desde que se lanzó
+            if prefetch and prefetch[0] == codigo and prefetch[1] == changes: cached = prefetch[2].result()
+            else: cached = self._read_calculation_data(self.db_manager, codigo)
+            if cached[0]: self._calc_cache[codigo] = cached
+        return cached
+
+    @staticmethod
+    def _read_calculation_data(db_manager, codigo):
+        """Lee los datos de cálculo y los reparte por departamento; se puede ejecutar fuera del hilo de Tk."""
+        data = db_manager.get_data_for_calculation(codigo)
+        # Reparto por departamento en una sola pasada, conservando el orden de la fabricación
+        tasks_by_dept = {}
+        for task in data:
+            tasks_by_dept.setdefault(task["departamento"], []).append(task)
+        return data, tasks_by_dept
 
     def open_department_planner(self, department_name):
-        units, calc_data = self._validate_and_load_data()
+        units, tasks_by_dept = self._validate_and_load_data()
         if not units: return
-        tasks_for_dept = [task for task in calc_data if task["departamento"] == department_name]
+        # Copia: la ventana reordena su lista y la del caché debe quedar intacta
+        tasks_for_dept = list(tasks_by_dept.get(department_name, ()))
         if not tasks_for_dept:
             messagebox.showinfo("Información", f"No hay tareas de '{department_name}' en esta fabricación.")
             return
@@ -1097,11 +1358,11 @@ class CalculateTimesFrame(ctk.CTkFrame):
         gc.collect()
 
         logging.info("Botón 'Generar Plan Completo' pulsado.")
-        units, calc_data = self._validate_and_load_data()
+        units, tasks_by_dept = self._validate_and_load_data()
         if not units:
             return
 
-        required_departments = {task['departamento'] for task in calc_data}
+        required_departments = tasks_by_dept.keys()
         if not all(dept in self.department_plans for dept in required_departments):
             messagebox.showwarning("Aviso",
                                    "Debe planificar todos los departamentos que tienen tareas en esta fabricación antes de generar el plan.")
@@ -1161,7 +1422,7 @@ class CalculateTimesFrame(ctk.CTkFrame):
                         task_id = f"T-{task_id_counter}"
                         current_deps = list(dependencies) if first_sub else [last_task_id_in_sequence]
                         new_task = Task(task_id, f"({task_data['codigo']}) {sub_task_data['descripcion']}",
-                                        sub_task_data["tiempo"] * 1.20 * units, dept_name,
+                                        sub_task_data["tiempo_real"] * units, dept_name,
                                         sub_task_data["tipo_trabajador"], current_deps)
                         all_tasks_for_scheduler.append(new_task)
                         first_sub = False
@@ -1170,7 +1431,7 @@ class CalculateTimesFrame(ctk.CTkFrame):
                 else:
                     task_id = f"T-{task_id_counter}"
                     new_task = Task(task_id, f"({dept_name[0]}) {task_data['codigo']}",
-                                    task_data["tiempo_optimo"] * 1.20 * units, dept_name, task_data["tipo_trabajador"],
+                                    task_data["tiempo_real"] * units, dept_name, task_data["tipo_trabajador"],
                                     list(dependencies))
                     all_tasks_for_scheduler.append(new_task)
                     last_task_id_in_sequence = new_task.id
@@ -1288,19 +1549,46 @@ class CalculateTimesFrame(ctk.CTkFrame):
         filepath = filedialog.asksaveasfilename(title="Exportar Plan a Excel", defaultextension=".xlsx",
                                                 filetypes=[("Excel files", "*.xlsx")])
         if not filepath: return
-        try:
-            df = pd.DataFrame(self.final_planned_tasks)
-            summary_df = df.groupby("Departamento")["Duracion (min)"].sum().reset_index()
-            summary_df["Duracion (horas)"] = round(summary_df["Duracion (min)"] / 60, 2)
-            summary_df["Duracion (jornadas)"] = round(summary_df["Duracion (min)"] / self.WORKDAY_MINUTES, 2)
-            with pd.ExcelWriter(filepath, engine="xlsxwriter") as writer:
-                df_export = df.copy()
-                df_export["Inicio"] = pd.to_datetime(df_export["Inicio"]).dt.strftime("%d-%m-%Y %H:%M")
-                df_export["Fin"] = pd.to_datetime(df_export["Fin"]).dt.strftime("%d-%m-%Y %H:%M")
-                df_export.to_excel(writer, sheet_name="Plan Detallado", index=False)
-                summary_df.to_excel(writer, sheet_name="Resumen por Departamento", index=False)
+        # El fichero se escribe en un hilo de trabajo; la interfaz sigue respondiendo mientras tanto
+        self.export_button.configure(state="disabled")
+        future = self._export_executor.submit(self._write_excel, filepath, list(self.final_planned_tasks),
+                                              self.WORKDAY_MINUTES)
+        after_future(self, future, lambda f: self._on_excel_written(filepath, f))
+
+    @staticmethod
+    def _write_excel(filepath, tasks, workday_minutes):
+        """Escribe el plan y su resumen por departamento; no toca widgets, se ejecuta fuera del hilo de Tk."""
+        # Se escribe fila a fila con xlsxwriter (el motor que ya usaba pandas), sin construir DataFrames
+        columns = list(tasks[0]) if tasks else []
+        minutes_by_dept = {}
+        # constant_memory: cada fila se vuelca al disco al pasar a la siguiente (se escriben en orden)
+        with xlsxwriter.Workbook(filepath, {"constant_memory": True}) as workbook:
+            header_fmt = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+            sheet = workbook.add_worksheet("Plan Detallado")
+            sheet.write_row(0, 0, columns, header_fmt)
+            date_cols = [columns.index(col) for col in ("Inicio", "Fin")] if tasks else []
+            for row_idx, task in enumerate(tasks, start=1):
+                row = [task[col] for col in columns]
+                for i in date_cols: row[i] = row[i].strftime("%d-%m-%Y %H:%M")
+                sheet.write_row(row_idx, 0, row)
+                dept = task["Departamento"]
+                minutes_by_dept[dept] = minutes_by_dept.get(dept, 0) + task["Duracion (min)"]
+
+            summary = workbook.add_worksheet("Resumen por Departamento")
+            summary.write_row(0, 0, ["Departamento", "Duracion (min)", "Duracion (horas)", "Duracion (jornadas)"],
+                              header_fmt)
+            for row_idx, dept in enumerate(sorted(minutes_by_dept), start=1):
+                minutes = minutes_by_dept[dept]
+                summary.write_row(row_idx, 0, [dept, minutes, round(minutes / 60, 2),
+                                               round(minutes / workday_minutes, 2)])
+
+    def _on_excel_written(self, filepath, future):
+        # Si entretanto se eligió otra fabricación, el botón debe seguir desactivado
+        if self.final_planned_tasks is not None: self.export_button.configure(state="normal")
+        e = future.exception()
+        if e is None:
             messagebox.showinfo("Éxito", f"El plan detallado ha sido exportado a:\n{filepath}")
-        except Exception as e:
+        else:
             logging.error(f"Error al exportar a Excel: {e}")
             messagebox.showerror("Error de Exportación", f"No se pudo guardar el archivo Excel:\n{e}")
 # =================================================================================
@@ -1399,11 +1687,11 @@ class SettingsFrame(ctk.CTkFrame):
         dest_path = filedialog.asksaveasfilename(title="Guardar copia de seguridad como...", defaultextension=".db",
                                                  filetypes=[("Database files", "*.db"), ("All files", "*.*")])
         if dest_path:
-            try:
-                shutil.copy(self.app_instance.db_path, dest_path)
+            # La API de backup de SQLite copia un estado consistente aunque haya cambios en el WAL
+            if self.app_instance.db_manager.backup_to(dest_path):
                 messagebox.showinfo("Éxito", f"Copia de seguridad guardada en:\n{dest_path}")
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo guardar la copia de seguridad:\n{e}")
+            else:
+                messagebox.showerror("Error", "No se pudo guardar la copia de seguridad.\nConsulte app.log para más detalles.")
 
     def import_db(self):
         if not messagebox.askyesno("Confirmar Importación",
@@ -1412,14 +1700,13 @@ class SettingsFrame(ctk.CTkFrame):
         source_path = filedialog.askopenfilename(title="Seleccionar base de datos para importar",
                                                  filetypes=[("Database files", "*.db")])
         if source_path:
-            try:
-                self.app_instance.db_manager.close()
-                shutil.copy(source_path, self.app_instance.db_path)
+            # Se restaura sobre la conexión abierta: si el fichero no es una BD válida, la actual queda intacta
+            if self.app_instance.db_manager.restore_from(source_path):
                 messagebox.showinfo("Éxito",
                                     "Base de datos importada. La aplicación se reiniciará para aplicar los cambios.")
                 self.app_instance.restart_app()
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo importar la base de datos:\n{e}")
+            else:
+                messagebox.showerror("Error", "No se pudo importar la base de datos.\nConsulte app.log para más detalles.")
 
     def change_db_path(self):
         initial_dir = os.path.dirname(self.app_instance.db_path)
@@ -1505,33 +1792,39 @@ class App(ctk.CTk):
             self.buttons[name] = button # Almacenar el botón en el diccionario
 
         # --- Inicialización de Frames de Contenido ---
-        # Asegúrate de que estas clases estén definidas antes de App
-        self.frames = {
-            "home": HomeFrame(self),
-            "add_product": AddProductFrame(self, self.db_manager),
-            "create_fabrication": CreateFabricacionFrame(self, self.db_manager),
-            "edit": EditFrame(self, self.db_manager),
-            "calculate": CalculateTimesFrame(self, self.db_manager),
-            "help": HelpFrame(self),
-            "settings": SettingsFrame(self, self)
+        # Cada frame se construye la primera vez que se visita (ver select_frame_by_name)
+        self._frame_factories = {
+            "home": lambda: HomeFrame(self),
+            "add_product": lambda: AddProductFrame(self, self.db_manager),
+            "create_fabrication": lambda: CreateFabricacionFrame(self, self.db_manager),
+            "edit": lambda: EditFrame(self, self.db_manager),
+            "calculate": lambda: CalculateTimesFrame(self, self.db_manager),
+            "help": lambda: HelpFrame(self),
+            "settings": lambda: SettingsFrame(self, self)
         }
+        self.frames = {}
+        self._current_frame_name = None  # Frame visible actualmente
 
         # Seleccionar el frame inicial (Home)
-        # Esto debe hacerse DESPUÉS de que self.buttons y self.frames estén completamente inicializados
+        # Esto debe hacerse DESPUÉS de que self.buttons y self._frame_factories estén completamente inicializados
         self.select_frame_by_name("home")
         logging.info("App.__init__ completado con éxito.")
 
     def select_frame_by_name(self, name):
         """Selecciona el frame de contenido a mostrar y actualiza el color del botón de navegación."""
-        # Restablecer el color de todos los botones de navegación
-        for btn_name, btn_widget in self.buttons.items():
-            btn_widget.configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
-
-        # Ocultar todos los frames de contenido
-        for frame in self.frames.values():
-            frame.grid_forget()
-
-        # Mostrar el frame seleccionado
+        previous = self._current_frame_name
+        if name == previous:
+            return
+        # Sólo hay un frame visible y un botón resaltado: basta con restablecer los anteriores
+        if previous in self.buttons:
+            self.buttons[previous].configure(fg_color=ctk.ThemeManager.theme["CTkButton"]["fg_color"])
+        if previous in self.frames:
+            self.frames[previous].grid_forget()
+        self._current_frame_name = name
+
+        # Mostrar el frame seleccionado, creándolo si es la primera visita
+        if name not in self.frames and name in self._frame_factories:
+            self.frames[name] = self._frame_factories[name]()
         if name in self.frames:
             self.frames[name].grid(row=0, column=1, padx=20, pady=20, sticky="nsew")
 
@@ -1,13 +1,24 @@
 # simulation_engine.py
 
+import heapq
+import itertools
 import logging
 from collections import deque
 from datetime import datetime
-from calendar_helper import add_work_minutes
+from functools import lru_cache
+from calendar_helper import add_work_minutes, count_workdays
+
+# Los cálculos de calendario sólo dependen de sus argumentos: muchas tareas comparten duración e inicio
+# (p. ej. las de una misma fabricación que arrancan a la vez), así que se memorizan.
+_add_work_minutes = lru_cache(maxsize=8192)(add_work_minutes)
+_count_workdays = lru_cache(maxsize=8192)(count_workdays)
 
 class Task:
     """Representa una única tarea a realizar."""
 
+    __slots__ = ('id', 'name', 'duration', 'department', 'worker_type', 'dependencies', 'start_time', 'end_time',
+                 'assigned_worker_id', '_reason_data', 'max_dep_end_time', 'pending_deps')
+
     def __init__(self, task_id, name, duration_minutes, department, worker_type, dependencies=None):
         self.id = task_id
         self.name = name
@@ -18,15 +29,64 @@ class Task:
         self.start_time = None
         self.end_time = None
         self.assigned_worker_id = None
-        self.start_reason = ""
+        # Datos con los que se compone start_reason: (trabajador, inicio más temprano calculado,
+        # tiempo actual del simulador, disponibilidad del trabajador tras la asignación)
+        self._reason_data = None
+        # Estado de planificación: fin más tardío de las dependencias ya planificadas y cuántas faltan
+        self.max_dep_end_time = datetime.min
+        self.pending_deps = len(set(self.dependencies))
 
     def __repr__(self):
         return f"Task({self.id}, {self.name})"
 
+    @property
+    def start_reason(self):
+        """Explica por qué la tarea empezó cuando lo hizo. Se compone al consultarlo, no al planificar."""
+        if self._reason_data is None:
+            return ""
+        worker_id, earliest_start_time, current_time, worker_available_time = self._reason_data
+        actual_task_start_time = self.start_time
+
+        # --- LÓGICA MEJORADA PARA start_reason ---
+        reason_parts = []
+        # 1. Razón de disponibilidad del trabajador
+        if actual_task_start_time > earliest_start_time:  # Esto significa que el trabajador no estaba disponible antes de earliest_start_time
+            reason_parts.append(f"Esperó a que el {worker_id} estuviera libre (fin de su tarea anterior).")
+        else:
+            reason_parts.append(f"Trabajador {worker_id} disponible.")
+
+        # 2. Razón de finalización de dependencias
+        # Al planificarse, todas sus dependencias lo están ya: su máximo es max_dep_end_time
+        if self.dependencies:
+            max_dep_end_time = self.max_dep_end_time
+            if actual_task_start_time < max_dep_end_time:  # Esto no debería pasar con la lógica de max(completed_deps_time, worker_available_time, self.current_time)
+                # Si esto ocurre, es un error de lógica, pero lo capturamos
+                reason_parts.append(f"ATENCIÓN: Inicio antes de dependencias.")
+            elif actual_task_start_time == max_dep_end_time:
+                reason_parts.append(
+                    f"Comenzó al finalizar todas las dependencias ({', '.join(self.dependencies)}).")
+            else:  # actual_task_start_time > max_dep_end_time
+                reason_parts.append(
+                    f"Dependencias ({', '.join(self.dependencies)}) finalizadas previamente.")
+        else:
+            reason_parts.append("No tiene dependencias directas.")
+
+        # 3. Razón de la fecha de inicio global o tiempo actual del simulador
+        if actual_task_start_time == current_time and actual_task_start_time > self.max_dep_end_time and \
+                actual_task_start_time == worker_available_time:
+            reason_parts.append("Pudo iniciar en la fecha de inicio más temprana posible del simulador.")
+        elif actual_task_start_time > current_time and actual_task_start_time == worker_available_time:
+            reason_parts.append(f"Esperó hasta que el trabajador {worker_id} estuviera libre.")
+
+        # --- FIN LÓGICA MEJORADA PARA start_reason ---
+        return " ".join(reason_parts)  # Unimos todas las partes de la razón
+
 
 class Worker:
     """Representa un trabajador individual."""
 
+    __slots__ = ('id', 'type', 'department')
+
     def __init__(self, worker_id, worker_type, department):
         self.id = worker_id
         self.type = worker_type
@@ -44,6 +104,10 @@ class WorkerPool:
         self.type = worker_type
         self.available_workers = deque(workers)
         self.busy_workers = {}  # key: worker_id, value: (Worker, available_from_time)
+        # Los mismos trabajadores ocupados ordenados por (available_from_time, orden de asignación):
+        # ante empates sale el asignado antes, igual que al recorrer busy_workers en orden
+        self._busy_heap = []
+        self._busy_seq = itertools.count()
 
     def get_earliest_available_worker(self):
         """Encuentra el trabajador (libre o el que se desocupa antes) y cuándo estará disponible."""
@@ -51,14 +115,11 @@ class WorkerPool:
             worker = self.available_workers[0]
             return datetime.min, worker
 
-        if not self.busy_workers:
+        if not self._busy_heap:
             return None, None
 
-        earliest_time = min(t for _, t in self.busy_workers.values())
-        for worker_id, (worker, available_time) in self.busy_workers.items():
-            if available_time == earliest_time:
-                return earliest_time, worker
-        return None, None
+        earliest_time, _, worker = self._busy_heap[0]
+        return earliest_time, worker
 
     def assign_worker(self, start_time, duration, workday_minutes):
         """Asigna un trabajador a una tarea y calcula cuándo terminará."""
@@ -66,20 +127,17 @@ class WorkerPool:
 
         if self.available_workers:
             worker_to_assign = self.available_workers.popleft()
-        elif self.busy_workers:
-            earliest_time = min(t for _, t in self.busy_workers.values())
-            for worker_id, (worker, available_time) in list(self.busy_workers.items()):
-                if available_time == earliest_time:
-                    worker_to_assign = worker
-                    del self.busy_workers[worker_id]
-                    break
+        elif self._busy_heap:
+            _, _, worker_to_assign = heapq.heappop(self._busy_heap)
+            del self.busy_workers[worker_to_assign.id]
 
         if not worker_to_assign:
             return None, None, None
 
         task_start_time = max(start_time, self.get_worker_availability_time(worker_to_assign.id))
-        task_end_time = add_work_minutes(task_start_time, duration, workday_minutes)
+        task_end_time = _add_work_minutes(task_start_time, duration, workday_minutes)
         self.busy_workers[worker_to_assign.id] = (worker_to_assign, task_end_time)
+        heapq.heappush(self._busy_heap, (task_end_time, next(self._busy_seq), worker_to_assign))
         return worker_to_assign, task_start_time, task_end_time
 
     def get_worker_availability_time(self, worker_id):
@@ -135,114 +193,90 @@ class Scheduler:
         # Guardamos la fecha de inicio global como el tiempo actual de la simulación
         self.current_time = datetime.combine(global_start_date, datetime.min.time())
         self.results_log = []
+        # Grafo inverso: tareas que esperan a cada una. Una dependencia inexistente nunca se cumple.
+        self.dependents = {task_id: [] for task_id in self.tasks}
+        for task in self.tasks.values():
+            for dep_id in set(task.dependencies):
+                if dep_id in self.dependents:
+                    self.dependents[dep_id].append(task)
         logging.info("Scheduler inicializado.")
 
     def run_simulation(self):
-        """Ejecuta la simulación encontrando y planificando la próxima tarea disponible."""
-        while any(t.start_time is None for t in self.tasks.values()):
-            next_task_to_schedule = None
-            earliest_start_time = None
-
-            for task in self.tasks.values():
-                if task.start_time is not None:
-                    continue
-
-                dependencies_met = True
-                completed_deps_time = datetime.min
-                for dep_id in task.dependencies:
-                    dep_task = self.tasks.get(dep_id)
-                    if not (dep_task and dep_task.end_time):
-                        dependencies_met = False
-                        break
-                    completed_deps_time = max(completed_deps_time, dep_task.end_time)
-
-                if not dependencies_met:
-                    continue
-
-                pool = self.resource_manager.get_pool(task.department, task.worker_type)
-                if not pool:
-                    continue
-
-                earliest_worker_info = pool.get_earliest_available_worker()
-                if earliest_worker_info[0] is None:
-                    continue
-
-                worker_available_time, _ = earliest_worker_info
-                # La tarea debe empezar después de las dependencias, cuando el trabajador esté libre,
-                # Y no antes de la fecha de inicio global que hemos establecido.
-                potential_start_time = max(completed_deps_time, worker_available_time, self.current_time)
-
-                if next_task_to_schedule is None or potential_start_time < earliest_start_time:
-                    earliest_start_time = potential_start_time
-                    next_task_to_schedule = task
-
-            if next_task_to_schedule:
-                task = next_task_to_schedule
-                pool = self.resource_manager.get_pool(task.department, task.worker_type)
-                worker, actual_task_start_time, end_time = pool.assign_worker(earliest_start_time, task.duration,
-                                                                              # Usar earliest_start_time calculado
-                                                                              self.workday_minutes)
-
-                if worker:
-                    task.start_time, task.end_time, task.assigned_worker_id = actual_task_start_time, end_time, worker.id
-
-                    # --- LÓGICA MEJORADA PARA start_reason ---
-                    reason_parts = []
-                    # 1. Razón de disponibilidad del trabajador
-                    if actual_task_start_time > earliest_start_time:  # Esto significa que el trabajador no estaba disponible antes de earliest_start_time
-                        reason_parts.append(f"Esperó a que el {worker.id} estuviera libre (fin de su tarea anterior).")
-                    else:
-                        reason_parts.append(f"Trabajador {worker.id} disponible.")
-
-                    # 2. Razón de finalización de dependencias
-                    dependencies_end_times = [self.tasks[dep_id].end_time for dep_id in task.dependencies if
-                                              self.tasks.get(dep_id) and self.tasks[dep_id].end_time]
-                    if dependencies_end_times:
-                        max_dep_end_time = max(dependencies_end_times)
-                        if actual_task_start_time < max_dep_end_time:  # Esto no debería pasar con la lógica de max(completed_deps_time, worker_available_time, self.current_time)
-                            # Si esto ocurre, es un error de lógica, pero lo capturamos
-                            reason_parts.append(f"ATENCIÓN: Inicio antes de dependencias.")
-                        elif actual_task_start_time == max_dep_end_time:
-                            reason_parts.append(
-                                f"Comenzó al finalizar todas las dependencias ({', '.join(task.dependencies)}).")
-                        else:  # actual_task_start_time > max_dep_end_time
-                            reason_parts.append(
-                                f"Dependencias ({', '.join(task.dependencies)}) finalizadas previamente.")
-                    else:
-                        reason_parts.append("No tiene dependencias directas.")
-
-                    # 3. Razón de la fecha de inicio global o tiempo actual del simulador
-                    if actual_task_start_time == self.current_time and actual_task_start_time > max(
-                            dependencies_end_times or [datetime.min]) and actual_task_start_time == (
-                    pool.get_worker_availability_time(worker.id) if pool else datetime.min):
-                        reason_parts.append("Pudo iniciar en la fecha de inicio más temprana posible del simulador.")
-                    elif actual_task_start_time > self.current_time and actual_task_start_time == (
-                    pool.get_worker_availability_time(worker.id) if pool else datetime.min):
-                        reason_parts.append(f"Esperó hasta que el trabajador {worker.id} estuviera libre.")
-
-                    task.start_reason = " ".join(reason_parts)  # Unimos todas las partes de la razón
-                    # --- FIN LÓGICA MEJORADA PARA start_reason ---
-
-                    self.log_task(task)
-                else:
-                    logging.error(f"Error irrecuperable: No se pudo asignar trabajador para {task.name}.")
-                    break
-            else:
-                # Si no hay más tareas que se puedan planificar, actualizamos el tiempo para liberar trabajadores
-                tasks_in_progress = [t for t in self.tasks.values() if t.start_time is not None and t.end_time is None]
-                if not tasks_in_progress:
-                    logging.error(
-                        "No se pudo encontrar la siguiente tarea a planificar. Posible deadlock de dependencias.")
-                    break
+        """Ejecuta la simulación encontrando y planificando la próxima tarea disponible.
+
+        Las tareas pasan a una cola de prioridad (heap) cuando todas sus dependencias están planificadas,
+        con clave (inicio potencial, orden de alta). El inicio potencial de una tarea nunca disminuye (el fin
+        de sus dependencias es fijo y sus trabajadores sólo se ocupan hasta más tarde), así que basta con
+        recalcularlo al sacarla: si ha crecido se vuelve a encolar y, si no, es la de inicio más temprano.
+        """
+        order = {task_id: i for i, task_id in enumerate(self.tasks)}
+        ready_heap = []
+
+        def push_ready(task):
+            pool = self.resource_manager.get_pool(task.department, task.worker_type)
+            # Sin pool o sin trabajadores la tarea no se puede planificar nunca
+            if not pool:
+                return
+            worker_available_time = pool.get_earliest_available_worker()[0]
+            if worker_available_time is None:
+                return
+            potential_start_time = max(task.max_dep_end_time, worker_available_time, self.current_time)
+            heapq.heappush(ready_heap, (potential_start_time, order[task.id], task.id))
+
+        for task in self.tasks.values():
+            if task.pending_deps == 0:
+                push_ready(task)
+
+        pending = len(self.tasks)
+        while ready_heap:
+            stored_start_time, idx, task_id = heapq.heappop(ready_heap)
+            task = self.tasks[task_id]
+            pool = self.resource_manager.get_pool(task.department, task.worker_type)
+            # La tarea debe empezar después de las dependencias, cuando el trabajador esté libre,
+            # Y no antes de la fecha de inicio global que hemos establecido.
+            earliest_start_time = max(task.max_dep_end_time, pool.get_earliest_available_worker()[0],
+                                      self.current_time)
+            if earliest_start_time != stored_start_time:
+                # El pool se ocupó desde que se encoló: se reordena con el nuevo inicio
+                heapq.heappush(ready_heap, (earliest_start_time, idx, task_id))
+                continue
+
+            worker, actual_task_start_time, end_time = pool.assign_worker(earliest_start_time, task.duration,
+                                                                          # Usar earliest_start_time calculado
+                                                                          self.workday_minutes)
+
+            if not worker:
+                logging.error(f"Error irrecuperable: No se pudo asignar trabajador para {task.name}.")
+                break
+            task.start_time, task.end_time, task.assigned_worker_id = actual_task_start_time, end_time, worker.id
+
+            # El motivo de inicio se compone al consultarlo (Task.start_reason): aquí sólo se guardan sus datos
+            task._reason_data = (worker.id, earliest_start_time, self.current_time,
+                                 pool.get_worker_availability_time(worker.id))
+
+            self.log_task(task)
+            pending -= 1
+
+            # Las tareas que esperaban a ésta pasan a la cola cuando ya no les falta ninguna dependencia
+            for dependent in self.dependents[task_id]:
+                if end_time > dependent.max_dep_end_time:
+                    dependent.max_dep_end_time = end_time
+                dependent.pending_deps -= 1
+                if dependent.pending_deps == 0:
+                    push_ready(dependent)
+        else:
+            # La cola se vació sin planificarlo todo: quedan tareas sin pool o con dependencias que nunca se cumplen
+            if pending:
+                logging.error(
+                    "No se pudo encontrar la siguiente tarea a planificar. Posible deadlock de dependencias.")
 
         logging.info("Simulación completada.")
         return sorted(self.results_log, key=lambda x: x['Inicio'])
 
     def log_task(self, task):
-        from calendar_helper import count_workdays
         self.results_log.append({
             "Tarea": task.name, "Departamento": task.department, "Inicio": task.start_time,
             "Fin": task.end_time, "Tipo Trabajador": task.worker_type, "Trabajador Asignado": task.assigned_worker_id,
-            "Duracion (min)": task.duration, "Dias Laborables": count_workdays(task.start_time, task.end_time),
+            "Duracion (min)": task.duration, "Dias Laborables": _count_workdays(task.start_time, task.end_time),
             "Motivo Inicio": task.start_reason
         })
\ No newline at end of file
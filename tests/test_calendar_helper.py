@@ -0,0 +1,85 @@
+import os
+import random
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_helper import add_work_minutes, is_workday  # noqa: E402
+
+
+def reference_add_work_minutes(start_datetime, minutes_to_add, WORKDAY_MINUTES):
+    """Versión original de add_work_minutes: avanza minuto a minuto fuera de días laborables y día a día dentro."""
+    current_datetime = start_datetime
+    remaining_minutes = minutes_to_add
+    while not is_workday(current_datetime.date()):
+        current_datetime += timedelta(minutes=1)
+        if current_datetime.hour == 0 and current_datetime.minute == 0:
+            if not is_workday(current_datetime.date()):
+                current_datetime = datetime.combine(current_datetime.date() + timedelta(days=1), datetime.min.time())
+
+    while remaining_minutes > 0:
+        current_date = current_datetime.date()
+        if is_workday(current_date):
+            end_of_current_day_work = (datetime.combine(current_date, datetime.min.time())
+                                       + timedelta(minutes=WORKDAY_MINUTES))
+            minutes_left_in_day = (end_of_current_day_work - current_datetime).total_seconds() / 60
+            if minutes_left_in_day <= 0:
+                current_datetime = datetime.combine(current_date + timedelta(days=1), datetime.min.time())
+                continue
+            if remaining_minutes <= minutes_left_in_day:
+                current_datetime += timedelta(minutes=remaining_minutes)
+                remaining_minutes = 0
+            else:
+                remaining_minutes -= minutes_left_in_day
+                current_datetime = datetime.combine(current_date + timedelta(days=1), datetime.min.time())
+        else:
+            current_datetime = datetime.combine(current_date + timedelta(days=1), datetime.min.time())
+    return current_datetime
+
+
+class AddWorkMinutesTest(unittest.TestCase):
+    """add_work_minutes salta jornadas completas de golpe; debe dar exactamente lo mismo que el bucle día a día."""
+
+    WORKDAY_MINUTES = (465, 480, 1440, 300, 2000, 465.0, 465.5, 100.25, 0.7)
+
+    def assertSameEnd(self, start, minutes, workday_minutes):
+        expected = reference_add_work_minutes(start, minutes, workday_minutes)
+        with self.subTest(start=start, minutes=minutes, workday_minutes=workday_minutes):
+            self.assertEqual(add_work_minutes(start, minutes, workday_minutes), expected)
+
+    def test_casos_limite(self):
+        starts = [
+            datetime(2025, 3, 1, 10, 37, 30, 250000),  # Sábado, con segundos
+            datetime(2025, 3, 2, 23, 59, 59),  # Domingo, justo antes de un lunes laborable
+            datetime(2025, 3, 5, 9, 15),  # Festivo (Cincomarzada)
+            datetime(2025, 4, 16, 12, 0),  # Víspera de Jueves y Viernes Santo + fin de semana
+            datetime(2025, 4, 17, 8, 0, 12),  # Jueves Santo: festivos consecutivos y fin de semana
+            datetime(2025, 4, 18, 23, 0),  # Viernes Santo
+            datetime(2025, 12, 5, 7, 45),  # Antes del puente de la Constitución/Inmaculada
+            datetime(2024, 12, 31, 0, 0),  # Fin de año
+            datetime(2025, 3, 3),  # Lunes a medianoche
+        ]
+        for workday_minutes in self.WORKDAY_MINUTES:
+            # Justo al final de la jornada y pasado ese final
+            end_of_shift = datetime(2025, 3, 3) + timedelta(minutes=workday_minutes)
+            for start in starts + [end_of_shift, end_of_shift + timedelta(seconds=1)]:
+                for minutes in (0, -5, 1, 7, workday_minutes, 2 * workday_minutes, 3 * workday_minutes + 0.5,
+                                10 * workday_minutes, 1234.567, 5000):
+                    self.assertSameEnd(start, minutes, workday_minutes)
+
+    def test_aleatorio(self):
+        rng = random.Random(20250101)
+        for _ in range(3000):
+            start = datetime(2024, 11, 1) + timedelta(days=rng.randint(0, 500), minutes=rng.randint(0, 1439),
+                                                      seconds=rng.choice([0, rng.randint(0, 59)]),
+                                                      microseconds=rng.choice([0, rng.randint(0, 999999)]))
+            workday_minutes = rng.choice(self.WORKDAY_MINUTES)
+            minutes = rng.choice([rng.randint(0, 20000), rng.uniform(0, 20000), 1.2 * rng.randint(1, 3000),
+                                  rng.randint(1, 10) * workday_minutes])
+            self.assertSameEnd(start, min(minutes, 500 * workday_minutes), workday_minutes)
+
+
+if __name__ == "__main__":
+    unittest.main()
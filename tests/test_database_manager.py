@@ -0,0 +1,276 @@
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database_manager  # noqa: E402
+from database_manager import DatabaseManager  # noqa: E402
+
+PRODUCTOS = [
+    ("A-100", "Tornillo 50% acero"),
+    ("B_200", "ÉMBOLO grande"),
+    ("C300", "émbolo pequeño"),
+    ("D400", "tuerca_m8"),
+    ("X1Y", "abc"),
+]
+
+
+def producto(codigo, descripcion):
+    return {"codigo": codigo, "descripcion": descripcion, "departamento": "Mecánica", "tipo_trabajador": 1,
+            "donde": "", "tiene_subfabricaciones": 0, "tiempo_optimo": 10.0}
+
+
+class SearchProductsTest(unittest.TestCase):
+    """Comportamiento de search_products con y sin el índice FTS5 de trigramas."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def setUp(self):
+        self.db = DatabaseManager(":memory:")
+        for codigo, descripcion in PRODUCTOS:
+            self.assertTrue(self.db.add_product(producto(codigo, descripcion)))
+        self.addCleanup(self.db.close)
+
+    def codigos(self, query):
+        return [row[0] for row in self.db.search_products(query)]
+
+    def test_comodines_literales(self):
+        fts_disponible = self.db.fts_enabled
+        for fts in (True, False):
+            with self.subTest(fts=fts):
+                self.db.fts_enabled = fts_disponible and fts
+                self.assertEqual(self.codigos("%"), ["A-100"])
+                self.assertEqual(self.codigos("_"), ["B_200", "D400"])
+                self.assertEqual(self.codigos("50%"), ["A-100"])
+                self.assertEqual(self.codigos("0%"), ["A-100"])
+                self.assertEqual(self.codigos("a_m"), ["D400"])
+                self.assertEqual(self.codigos("r_m"), [])
+
+    def test_fts_ignora_mayusculas_pero_no_tildes(self):
+        if not self.db.fts_enabled:
+            self.skipTest("SQLite sin FTS5/trigram")
+        self.assertEqual(self.codigos("ÉMBOLO"), ["B_200", "C300"])
+        self.assertEqual(self.codigos("émbolo"), ["B_200", "C300"])
+        self.assertEqual(self.codigos("embolo"), [])
+
+    def test_consultas_cortas(self):
+        self.assertEqual(self.codigos("x"), ["X1Y"])
+        self.assertEqual(self.codigos("1y"), ["X1Y"])
+        self.assertEqual(self.codigos("AC"), ["A-100"])
+        # LIKE sólo ignora mayúsculas en ASCII
+        self.assertEqual(self.codigos("É"), ["B_200"])
+
+    def test_texto_concatenado(self):
+        self.assertEqual(self.db.search_products("X1Y", separador=" | "), [("X1Y", "abc", "X1Y | abc")])
+
+
+class SearchFabricacionesTest(unittest.TestCase):
+    """search_fabricaciones busca '%', '_' y '\\' literalmente, con y sin prefijo."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def setUp(self):
+        self.db = DatabaseManager(":memory:")
+        self.addCleanup(self.db.close)
+        for codigo, descripcion in [("F_01", "Bastidor 100%"), ("FX01", "Bastidor simple"),
+                                    ("G\\02", "Cuadro"), ("G02", "Cuadro doble")]:
+            self.assertTrue(self.db.add_fabricacion(codigo, descripcion, []))
+
+    def codigos(self, query, prefijo):
+        return sorted(row[0] for row in self.db.search_fabricaciones(query, prefijo=prefijo))
+
+    def test_comodines_literales(self):
+        for prefijo in (False, True):
+            with self.subTest(prefijo=prefijo):
+                self.assertEqual(self.codigos("F_", prefijo), ["F_01"])
+                self.assertEqual(self.codigos("G\\", prefijo), ["G\\02"])
+                self.assertEqual(self.codigos("%", prefijo), [] if prefijo else ["F_01"])
+        self.assertEqual(self.codigos("_0", False), ["F_01"])
+        self.assertEqual(self.codigos("0%", False), ["F_01"])
+
+
+class DetailsCacheTest(unittest.TestCase):
+    """Las fichas cacheadas se descartan también cuando escribe otra conexión (otro equipo)."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        db_path = os.path.join(tmp.name, "montaje.db")
+        self.db = DatabaseManager(db_path)
+        self.addCleanup(self.db.close)
+        self.other = DatabaseManager(db_path)
+        self.addCleanup(self.other.close)
+        self.assertTrue(self.db.add_product(producto("A-100", "Tornillo")))
+
+    def test_escritura_de_otra_conexion(self):
+        token = self.db.change_token()
+        self.assertEqual(self.db.get_product_details("A-100")[0][1], "Tornillo")
+        self.assertEqual(self.db.change_token(), token)
+
+        self.assertTrue(self.other.update_product("A-100", producto("A-100", "Tornillo M8")))
+        self.assertNotEqual(self.db.change_token(), token)
+        self.assertEqual(self.db.get_product_details("A-100")[0][1], "Tornillo M8")
+
+    def test_escritura_propia(self):
+        token = self.db.change_token()
+        self.assertTrue(self.db.add_product(producto("B-200", "Tuerca")))
+        self.assertNotEqual(self.db.change_token(), token)
+
+
+class JournalModeTest(unittest.TestCase):
+    """WAL sólo en discos locales; en unidades de red se mantiene el diario de rollback."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = os.path.join(tmp.name, "montaje.db")
+
+    def journal_mode(self, db):
+        return db.conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    def test_disco_local_usa_wal(self):
+        with mock.patch.object(database_manager, "_is_local_path", return_value=True):
+            db = DatabaseManager(self.db_path)
+        self.addCleanup(db.close)
+        self.assertEqual(self.journal_mode(db), "wal")
+
+    def test_unidad_de_red_desactiva_wal(self):
+        # Una BD que ya quedó en modo WAL (abierta antes desde un disco local) vuelve al diario clásico
+        with mock.patch.object(database_manager, "_is_local_path", return_value=True):
+            DatabaseManager(self.db_path).close()
+        with mock.patch.object(database_manager, "_is_local_path", return_value=False):
+            db = DatabaseManager(self.db_path)
+        self.addCleanup(db.close)
+        self.assertEqual(self.journal_mode(db), "delete")
+
+    @unittest.skipIf(os.name == "nt", "En Windows se consulta el tipo de unidad, no /proc/mounts")
+    def test_punto_de_montaje_con_escapes(self):
+        mounts = ("/dev/sda1 / ext4 rw 0 0\n"
+                  "//servidor/datos /mnt/unidad\\040de\\040red cifs rw 0 0\n"
+                  "servidor:/export /mnt/tab\\011y\\134barra nfs4 rw 0 0\n")
+        with mock.patch("database_manager.open", mock.mock_open(read_data=mounts), create=True):
+            self.assertFalse(database_manager._is_local_path("/mnt/unidad de red/montaje.db"))
+            self.assertFalse(database_manager._is_local_path("/mnt/tab\ty\\barra/montaje.db"))
+            self.assertTrue(database_manager._is_local_path("/mnt/unidad/montaje.db"))
+            self.assertTrue(database_manager._is_local_path("/home/montaje.db"))
+
+
+class BackupRestoreTest(unittest.TestCase):
+    """backup_to/restore_from, que usan Exportar/Importar Base de Datos en Configuración."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.db_path = os.path.join(self.dir, "montaje.db")
+        self.db = DatabaseManager(self.db_path)
+        self.addCleanup(self.db.close)
+        self.assertTrue(self.db.add_product(producto("A-100", "Tornillo")))
+
+    def codigos(self):
+        return [row[0] for row in self.db.search_products("")]
+
+    def test_copia_y_restauracion(self):
+        backup_path = os.path.join(self.dir, "copia.db")
+        self.assertTrue(self.db.backup_to(backup_path))
+        self.assertTrue(self.db.add_product(producto("B-200", "Tuerca")))
+        self.assertTrue(self.db.delete_product("A-100"))
+        self.assertEqual(self.codigos(), ["B-200"])
+
+        self.assertTrue(self.db.restore_from(backup_path))
+        self.assertEqual(self.codigos(), ["A-100"])
+        self.assertEqual(self.db.get_product_details("A-100")[0][1], "Tornillo")
+        self.assertEqual(self.db.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        # La copia es un único fichero, sin temporales ni -wal junto a ella
+        self.assertEqual(sorted(f for f in os.listdir(self.dir) if f.startswith("copia")), ["copia.db"])
+        self.assertFalse([f for f in os.listdir(self.dir) if f.endswith(".tmp")])
+
+    def test_restaurar_con_otro_tamano_de_pagina(self):
+        # La BD abierta está en modo WAL, que no admite cambiar el tamaño de página al restaurar
+        source_path = os.path.join(self.dir, "pagina_1024.db")
+        source = sqlite3.connect(source_path)
+        source.execute("PRAGMA page_size=1024")
+        source.execute("CREATE TABLE productos (codigo TEXT PRIMARY KEY, descripcion TEXT NOT NULL, "
+                       "departamento TEXT NOT NULL, tipo_trabajador INTEGER NOT NULL, donde TEXT, "
+                       "tiene_subfabricaciones INTEGER NOT NULL, tiempo_optimo REAL)")
+        source.execute("INSERT INTO productos VALUES ('C-300', 'Arandela', 'Montaje', 2, '', 0, 5.0)")
+        source.commit()
+        source.close()
+
+        self.assertTrue(self.db.restore_from(source_path))
+        self.assertEqual(self.db.conn.execute("PRAGMA page_size").fetchone()[0], 1024)
+        self.assertEqual(self.codigos(), ["C-300"])
+
+    def test_copia_sobre_la_propia_bd(self):
+        self.assertFalse(self.db.backup_to(self.db_path))
+        self.assertTrue(os.path.exists(self.db_path))
+        self.assertTrue(self.db.add_product(producto("B-200", "Tuerca")))
+        with sqlite3.connect(self.db_path) as other:
+            self.assertEqual(other.execute("SELECT count(*) FROM productos").fetchone()[0], 2)
+
+    def test_copia_fallida_conserva_la_anterior(self):
+        backup_path = os.path.join(self.dir, "copia.db")
+        with open(backup_path, "wb") as f:
+            f.write(b"copia anterior")
+        closed = sqlite3.connect(":memory:")
+        closed.close()
+        # La conexión destino cerrada hace fallar la API de backup
+        with mock.patch.object(database_manager.sqlite3, "connect", return_value=closed):
+            self.assertFalse(self.db.backup_to(backup_path))
+        with open(backup_path, "rb") as f:
+            self.assertEqual(f.read(), b"copia anterior")
+        self.assertFalse([f for f in os.listdir(self.dir) if f.endswith(".tmp")])
+
+    def test_restaurar_fichero_inexistente_o_invalido(self):
+        self.assertFalse(self.db.restore_from(os.path.join(self.dir, "no_existe.db")))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "no_existe.db")))
+        invalid_path = os.path.join(self.dir, "invalido.db")
+        with open(invalid_path, "wb") as f:
+            f.write(b"x" * 4096)
+        self.assertFalse(self.db.restore_from(invalid_path))
+        self.assertEqual(self.codigos(), ["A-100"])
+
+
+if __name__ == "__main__":
+    unittest.main()
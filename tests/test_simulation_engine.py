@@ -0,0 +1,84 @@
+import logging
+import os
+import sys
+import unittest
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulation_engine import ResourceManager, Scheduler, Task  # noqa: E402
+
+
+class RunSimulationTest(unittest.TestCase):
+    """
+    Plan fijo con empates (dos trabajadores que se liberan a la vez, tareas listas en el mismo instante)
+    y tareas imposibles. Los valores esperados son los que daba el planificador antes de usar colas de
+    prioridad: el orden de elección entre empates no debe cambiar el resultado.
+    """
+
+    EXPECTED = {
+        "M1": (datetime(2025, 4, 16, 0, 0), datetime(2025, 4, 16, 5, 0), "MEC-T1-1"),
+        "M2": (datetime(2025, 4, 16, 0, 0), datetime(2025, 4, 16, 5, 0), "MEC-T1-2"),
+        "M3": (datetime(2025, 4, 16, 5, 0), datetime(2025, 4, 21, 2, 15), "MEC-T1-1"),
+        "M4": (datetime(2025, 4, 16, 5, 0), datetime(2025, 4, 16, 7, 0), "MEC-T1-2"),
+        "E1": (datetime(2025, 4, 16, 5, 0), datetime(2025, 4, 21, 5, 0), "ELE-T1-1"),
+        "E2": (datetime(2025, 4, 21, 5, 0), datetime(2025, 4, 22, 5, 0), "ELE-T1-1"),
+        "E3": (datetime(2025, 4, 16, 5, 0), datetime(2025, 4, 16, 6, 30, 30), "ELE-T2-1"),
+        "A1": (datetime(2025, 4, 21, 5, 0), datetime(2025, 4, 22, 7, 15), "MON-T1-2"),
+        "A2": (datetime(2025, 4, 22, 5, 0), datetime(2025, 4, 24, 7, 15), "MON-T1-1"),
+        "A3": (datetime(2025, 4, 16, 7, 0), datetime(2025, 4, 21, 0, 15), "MON-T1-1"),
+        "A4": (datetime(2025, 4, 24, 7, 15), datetime(2025, 4, 29, 0, 40), "MON-T1-2"),
+        # Sin trabajadores de ese tipo, con una dependencia inexistente o que depende de una imposible
+        "X1": (None, None, None),
+        "X2": (None, None, None),
+        "X3": (None, None, None),
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def setUp(self):
+        plans = {"Mecánica": {"workers": {1: 2, 2: 0}}, "Electrónica": {"workers": {1: 1, 2: 1}},
+                 "Montaje": {"workers": {1: 2}}}
+        self.tasks = [
+            Task("M1", "m1", 300, "Mecánica", 1),
+            Task("M2", "m2", 300, "Mecánica", 1),
+            Task("M3", "m3", 300, "Mecánica", 1),
+            Task("M4", "m4", 120, "Mecánica", 1, ["M1"]),
+            Task("E1", "e1", 465, "Electrónica", 1, ["M1"]),
+            Task("E2", "e2", 465, "Electrónica", 1, ["M2"]),
+            Task("E3", "e3", 90.5, "Electrónica", 2, ["M1", "M2"]),
+            Task("A1", "a1", 600, "Montaje", 1, ["E1", "E3"]),
+            Task("A2", "a2", 600, "Montaje", 1, ["E2", "M3"]),
+            Task("A3", "a3", 60, "Montaje", 1, ["M4", "M4"]),
+            Task("A4", "a4", 1000, "Montaje", 1, ["A1", "A2", "A3"]),
+            Task("X1", "sin trabajadores", 10, "Mecánica", 2),
+            Task("X2", "dependencia inexistente", 10, "Montaje", 1, ["NO-EXISTE"]),
+            Task("X3", "depende de X1", 10, "Montaje", 1, ["X1"]),
+        ]
+        # Miércoles antes de Jueves y Viernes Santo: las tareas largas cruzan festivos y fin de semana
+        scheduler = Scheduler(self.tasks, ResourceManager(plans), date(2025, 4, 16), 465)
+        self.results = scheduler.run_simulation()
+
+    def test_inicio_fin_y_trabajador(self):
+        for task in self.tasks:
+            with self.subTest(task=task.id):
+                self.assertEqual((task.start_time, task.end_time, task.assigned_worker_id), self.EXPECTED[task.id])
+
+    def test_registro_de_resultados(self):
+        self.assertEqual([row["Tarea"] for row in self.results],
+                         ["m1", "m2", "m3", "m4", "e1", "e3", "a3", "e2", "a1", "a2", "a4"])
+        self.assertEqual(self.results[-1]["Motivo Inicio"],
+                         "Trabajador MON-T1-2 disponible. Comenzó al finalizar todas las dependencias (A1, A2, A3).")
+        self.assertEqual(self.results[0]["Motivo Inicio"],
+                         "Trabajador MEC-T1-1 disponible. No tiene dependencias directas.")
+        self.assertEqual(self.tasks[11].start_reason, "")
+
+
+if __name__ == "__main__":
+    unittest.main()